@@ -0,0 +1,357 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from random import Random
+from cardlib import *
+from pokerengine import GameListener, Player, TexasHoldEm
+
+# A benchmark is a function setup(size) returning a function that runs size operations, so that the setup is not
+# timed. The result of a benchmark is the best time per operation over a number of repeats, which is the least noisy
+# estimate on a busy machine.
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+
+def _random_hands(size, cards=7, seed=0):
+    rng = Random(seed)
+    return [rng.sample(CARDS, cards) for _ in range(size)]
+
+
+def _uncached(run):
+    """
+    Runs a benchmark with PokerHand.cache switched off, so that the repeats time the evaluator and not cache hits on
+    the hands of the first run
+    """
+    def uncached():
+        cache, PokerHand.cache = PokerHand.cache, None
+        try:
+            run()
+        finally:
+            PokerHand.cache = cache
+    return uncached
+
+
+def poker_hand(size):
+    """
+    PokerHand construction and comparison on random 7-card sets
+    """
+    hands = _random_hands(size + 1)
+
+    def run():
+        previous = PokerHand(hands[0])
+        for cards in hands[1:]:
+            current = PokerHand(cards)
+            current < previous
+            previous = current
+    return _uncached(run)
+
+
+def best_poker_hand(size):
+    """
+    Hand.best_poker_hand of two hole cards and five table cards
+    """
+    hands = []
+    for cards in _random_hands(size):
+        hand = Hand()
+        hand.add_card(cards[0])
+        hand.add_card(cards[1])
+        hands.append((hand, cards[2:]))
+
+    def run():
+        for hand, table in hands:
+            hand.best_poker_hand(table)
+    return _uncached(run)
+
+
+def evaluate_masks(size):
+    """
+    evaluate_mask on random 7-card masks
+    """
+    masks = [cards_to_mask(cards) for cards in _random_hands(size)]
+
+    def run():
+        for mask in masks:
+            evaluate_mask(mask)
+    return run
+
+
+def evaluate_batches(size):
+    """
+    evaluate_batch on an array of random 7-card hands
+    """
+    cards = [[card.index for card in hand] for hand in _random_hands(size)]
+
+    def run():
+        evaluate_batch(cards)
+    return run
+
+
+def _hand_table():
+    import handtable
+    if not os.path.exists(handtable.DEFAULT_PATH):
+        raise FileNotFoundError("no hand table, build it with handtable.py")
+    return handtable.HandTable()
+
+
+def hand_table_mask(size):
+    """
+    HandTable.evaluate_mask on random 7-card masks, only if the table has been built
+    """
+    table = _hand_table()
+    masks = [cards_to_mask(cards) for cards in _random_hands(size)]
+
+    def run():
+        for mask in masks:
+            table.evaluate_mask(mask)
+    return run
+
+
+def hand_table_batch(size):
+    """
+    HandTable.evaluate_batch on an array of random 7-card hands, only if the table has been built
+    """
+    table = _hand_table()
+    cards = [[card.index for card in hand] for hand in _random_hands(size)]
+
+    def run():
+        table.evaluate_batch(cards)
+    return run
+
+
+def deck_create(size):
+    """
+    StandardDeck construction
+    """
+    def run():
+        for _ in range(size):
+            StandardDeck()
+    return run
+
+
+def deck_shuffle_draw(size):
+    """
+    Resetting, shuffling and dealing a heads-up hand (4 hole cards and 5 table cards) from one deck
+    """
+    deck = StandardDeck()
+
+    def run():
+        for seed in range(size):
+            deck.reset()
+            deck.shuffle(seed)
+            deck.draw(4)
+            deck.draw(3)
+            deck.draw()
+            deck.draw()
+    return run
+
+
+class _RoundCounter(GameListener):
+    def __init__(self):
+        self.rounds = 0
+
+    def on_new_round(self, game):
+        self.rounds += 1
+
+
+def engine_hands(size):
+    """
+    Full TexasHoldEm hands driven to a showdown: a call, a bet and a call, and checks down to the river
+    """
+    def run():
+        counter = _RoundCounter()
+        game = None
+        while counter.rounds < size:
+            if game is None or game.game_over:
+                game = TexasHoldEm([Player('A'), Player('B')], listeners=[counter], seed=counter.rounds)
+            game.call()
+            game.check()
+            game.check()
+            game.bet(50)
+            game.call()
+            for _ in range(6):
+                game.check()
+    return run
+
+
+def range_equity(size):
+    """
+    Range against range equity on a flop, all 1,081 turn and river cards
+    """
+    import ranges
+    board = ranges.parse_cards('Ah7d2c')
+    hero, villain = ranges.Range.parse('TT+, AKs, KQo'), ranges.Range.parse('22+, A2s+, KTo+, QJs')
+
+    def run():
+        for _ in range(size):
+            ranges.range_equity(hero, villain, board)
+    return run
+
+
+_app = None     # The Qt application outlives the benchmarks, the card renderers are only valid as long as it does
+
+
+def _card_view(size, raster):
+    global _app
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    import pokerview
+    app = _app = QApplication.instance() or QApplication([])
+    table = pokerview.TableModel()
+    view = pokerview.CardView(table, raster=raster)
+    view.resize(800, 200)
+    view.show()
+    hands = _random_hands(size, cards=5)
+
+    def run():
+        for cards in hands:
+            table.clear()
+            for card in cards:
+                table.add_cards(card)
+            view.viewport().repaint()
+        app.processEvents()
+    return run
+
+
+def card_view(size):
+    """
+    Offscreen CardView redraws while five cards are dealt one by one, drawn as SVG items
+    """
+    return _card_view(size, raster=False)
+
+
+def card_view_raster(size):
+    """
+    Offscreen CardView redraws while five cards are dealt one by one, drawn from cached pixmaps
+    """
+    return _card_view(size, raster=True)
+
+
+# Name: (benchmark, operations per run)
+BENCHMARKS = {
+    'poker_hand': (poker_hand, 10000),
+    'best_poker_hand': (best_poker_hand, 10000),
+    'evaluate_mask': (evaluate_masks, 20000),
+    'evaluate_batch': (evaluate_batches, 100000),
+    'hand_table_mask': (hand_table_mask, 20000),
+    'hand_table_batch': (hand_table_batch, 100000),
+    'deck_create': (deck_create, 10000),
+    'deck_shuffle_draw': (deck_shuffle_draw, 10000),
+    'engine_hands': (engine_hands, 1000),
+    'range_equity': (range_equity, 5),
+    'card_view': (card_view, 100),
+    'card_view_raster': (card_view_raster, 100),
+}
+
+
+def measure(benchmark, size, repeat=5):
+    """
+    Times a benchmark
+
+    :param benchmark: Setup function, see BENCHMARKS
+
+    :param size: Operations per run
+
+    :param repeat: Number of runs
+
+    :return: Best time per operation in seconds
+    """
+    run = benchmark(size)
+    run()   # Warm up caches and lazily built tables
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best / size
+
+
+def run_all(names=None, repeat=5, scale=1.0, report=None):
+    """
+    Runs benchmarks. The ones that need a missing optional dependency (PyQt5 for the views) or a file that has not
+    been built (the hand table) are skipped.
+
+    :param names: Names of the benchmarks to run, None for all of them
+
+    :param repeat: Runs per benchmark
+
+    :param scale: Factor on the number of operations per run
+
+    :param report: Optional callback called with the name and the result of every benchmark
+
+    :return: dict from name to {'seconds': time per operation, 'operations': operations per run}
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        benchmark, size = BENCHMARKS[name]
+        size = max(1, int(size * scale))
+        try:
+            seconds = measure(benchmark, size, repeat)
+        except (ImportError, FileNotFoundError) as error:
+            print(f"{name}: skipped, {error}", file=sys.stderr)
+            continue
+        results[name] = {'seconds': seconds, 'operations': size}
+        if report is not None:
+            report(name, results[name])
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Compares results to a baseline
+
+    :param results: Results of run_all
+
+    :param baseline: Results of an earlier run_all
+
+    :param tolerance: Allowed slowdown, e.g. 0.2 for 20 %
+
+    :return: List of (name, ratio of the time to the baseline time, True if it is a regression)
+    """
+    return [(name, result['seconds'] / baseline[name]['seconds'],
+             result['seconds'] > baseline[name]['seconds'] * (1 + tolerance))
+            for name, result in results.items() if name in baseline]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the hot paths of the evaluator, deck, engine and views.')
+    parser.add_argument('names', nargs='*', help='benchmarks to run (' + ', '.join(BENCHMARKS) + '), default all')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='JSON results to compare with, if it exists')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown before failing, default 0.2')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scale', type=float, default=1.0, help='factor on the operations per run')
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error('unknown benchmarks: ' + ', '.join(unknown))
+
+    def report(name, result):
+        print(f"{name:20} {result['seconds'] * 1e6:12.3f} us/op", file=sys.stderr)
+
+    results = run_all(args.names, args.repeat, args.scale, report)
+    document = {'python': platform.python_version(), 'platform': platform.platform(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(document, file, indent=2)
+
+    regressions = False
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+        for name, ratio, regression in compare(results, baseline, args.tolerance):
+            regressions |= regression
+            print(f"{name:20} {ratio:6.2f}x baseline{'  REGRESSION' if regression else ''}")
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(document, file, indent=2)
+        print(f"Saved the baseline to {args.baseline}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
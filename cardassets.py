@@ -0,0 +1,139 @@
+import argparse
+import os
+import struct
+from cardlib import Suit
+
+CARD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cards')    # Works from any working directory
+ATLAS_PATH = os.path.join(CARD_DIR, 'cards.atlas')
+BACK = 'Red_Back_2'
+TABLE = os.path.join(CARD_DIR, 'table.png')
+
+_VALUE_FILES = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+_SUIT_FILES = dict(zip(Suit, 'HSCD'))
+
+# The atlas packs the SVG sources of the cards into one file, so they are read in one go instead of one file each:
+#   _MAGIC, u16 number of images, per image: u8 name length, name, u32 size of the SVG source
+#   the sources one after the other in the same order
+_MAGIC = b'CATL'
+_COUNT = struct.Struct('<H')
+_SIZE = struct.Struct('<I')
+
+
+def card_name(value, suit):
+    """
+    The name of a card's image, which is also its file name without the extension
+
+    :param value: 2 to 14 for two to ace
+
+    :param suit: Suit
+
+    :return: e.g. '10H'
+    """
+    return _VALUE_FILES[value - 2] + _SUIT_FILES[suit]
+
+
+def image_names():
+    """
+    :return: Names of the 52 faces and the back
+    """
+    return [card_name(value, suit) for suit in Suit for value in range(2, 15)] + [BACK]
+
+
+class CardAssets:
+    """
+    The SVG sources of the card images. They come from the atlas when it has been built and from the single files
+    otherwise, and nothing is read before the first image is asked for.
+    """
+    def __init__(self, directory=CARD_DIR, atlas=ATLAS_PATH):
+        """
+        :param directory: Folder with the SVG files
+
+        :param atlas: Atlas file, used if it exists
+        """
+        self.directory = directory
+        self.atlas = atlas
+        self.sources = None
+
+    def __load(self):
+        self.sources = {}
+        if self.atlas and os.path.exists(self.atlas):
+            self.sources = read_atlas(self.atlas)
+
+    def source(self, name):
+        """
+        :param name: Image name, see card_name and BACK
+
+        :return: SVG source as bytes
+        """
+        if self.sources is None:
+            self.__load()
+        if name not in self.sources:
+            with open(os.path.join(self.directory, name + '.svg'), 'rb') as file:
+                self.sources[name] = file.read()
+        return bytes(self.sources[name])
+
+
+def read_atlas(path):
+    """
+    Reads an atlas built by build_atlas
+
+    :param path: Atlas file
+
+    :return: dict from image name to SVG source, as memoryviews of the file content
+    """
+    with open(path, 'rb') as file:
+        data = memoryview(file.read())
+    if data[:len(_MAGIC)] != _MAGIC:
+        raise ValueError(f"{path} is not a card atlas")
+    count, = _COUNT.unpack_from(data, len(_MAGIC))
+    offset = len(_MAGIC) + _COUNT.size
+    entries = []
+    for _ in range(count):
+        length = data[offset]
+        name = bytes(data[offset + 1:offset + 1 + length]).decode()
+        size, = _SIZE.unpack_from(data, offset + 1 + length)
+        offset += 1 + length + _SIZE.size
+        entries.append((name, size))
+    sources = {}
+    for name, size in entries:
+        sources[name] = data[offset:offset + size]
+        offset += size
+    return sources
+
+
+def build_atlas(path=ATLAS_PATH, directory=CARD_DIR):
+    """
+    Packs the SVG files of the faces and the back into an atlas
+
+    :param path: Atlas file to write
+
+    :param directory: Folder with the SVG files
+
+    :return: Size of the atlas in bytes
+    """
+    names = image_names()
+    sources = []
+    for name in names:
+        with open(os.path.join(directory, name + '.svg'), 'rb') as file:
+            sources.append(file.read())
+    parts = [_COUNT.pack(len(names))]
+    for name, source in zip(names, sources):
+        encoded = name.encode()
+        parts.append(bytes([len(encoded)]) + encoded + _SIZE.pack(len(source)))
+    parts.extend(sources)
+    data = _MAGIC + b''.join(parts)
+    with open(path, 'wb') as file:
+        file.write(data)
+    return len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack the card images into an atlas that is read in one go.')
+    parser.add_argument('--output', default=ATLAS_PATH)
+    args = parser.parse_args()
+    size = build_atlas(args.output)
+    print(f'Wrote {args.output}, {size} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,13 @@
 from enum import Enum
 from abc import ABC, abstractmethod
-from random import shuffle
-from collections import Counter
+from array import array
+from collections import OrderedDict
+from random import Random
+import struct
+import sys
+import threading
+
+_np = None   # numpy is only needed for evaluate_batch, which imports it the first time it is called
 
 
 class Suit(Enum):
@@ -20,15 +26,26 @@ class PlayingCard(ABC):
     """
     Is an abstract base class, which will work as a blueprint for creating the cards.
     """
+    __slots__ = ('suit', 'index')
 
     def __init__(self, suit: Suit):
         """
-        Constructs suit
+        Constructs suit and the compact integer encoding of the card, suit.value * 13 + value - 2 (0-51)
 
         :param suit:
 
         """
         self.suit = suit
+        self.index = suit.value * 13 + self.get_value() - 2
+
+    @property
+    def mask(self):
+        """
+        The card as a single bit in a 52-bit card set mask
+
+        :return: 1 << index
+        """
+        return 1 << self.index
 
     @abstractmethod
     def get_value(self):
@@ -63,6 +80,8 @@ class NumberedCard(PlayingCard):
     """
     Subclass of PlayingCard which it inherits from. Subclass is the numbered cards in a deck.
     """
+    __slots__ = ('value',)
+
     def __init__(self, value, suit):
         """
         Constructs the card with value and inherit suit from PlayingCard
@@ -93,6 +112,8 @@ class JackCard(PlayingCard):
     """
     Subclass of PlayingCard which it inherits from. Subclass is the Jack card in a deck corresponding to value 11.
     """
+    __slots__ = ()
+
     def get_value(self):
         """
         Method of retrieving card values
@@ -113,6 +134,7 @@ class QueenCard(PlayingCard):
     """
     Subclass of PlayingCard which it inherits from. Subclass is the Queen card in a deck corresponding to value 12.
     """
+    __slots__ = ()
 
     def get_value(self):
         """
@@ -134,6 +156,8 @@ class KingCard(PlayingCard):
     """
     Subclass of PlayingCard which it inherits from. Subclass is the King card in a deck corresponding to value 13.
     """
+    __slots__ = ()
+
     def get_value(self):
         """
         Method of retrieving card values
@@ -154,6 +178,8 @@ class AceCard(PlayingCard):
     """
     Subclass of PlayingCard which it inherits from. Subclass is the Ace card in a deck corresponding to value 14.
     """
+    __slots__ = ()
+
     def get_value(self):
         """
         Method of retrieving card values
@@ -170,37 +196,174 @@ class AceCard(PlayingCard):
         return f"Ace of {self.suit.name}"
 
 
+def make_card(value, suit):
+    """
+    Creates the card of the given value and suit
+
+    :param value: 2-14
+
+    :param suit:
+
+    :return: NumberedCard, JackCard, QueenCard, KingCard or AceCard
+    """
+    face_cards = {11: JackCard, 12: QueenCard, 13: KingCard, 14: AceCard}
+    if value in face_cards:
+        return face_cards[value](suit)
+    return NumberedCard(value, suit)
+
+
+# One shared card object per compact encoding. Decks, hands and evaluators work on the integers and use this tuple
+# to hand out card objects for the view layer.
+CARDS = tuple(make_card(index % 13 + 2, Suit(index // 13)) for index in range(52))
+
+
+def cards_to_mask(cards):
+    """
+    Converts cards to a 52-bit card set mask
+
+    :param cards: Iterable of cards
+
+    :return: Mask with bit card.index set for every card
+    """
+    mask = 0
+    for c in cards:
+        mask |= 1 << c.index
+    return mask
+
+
+def mask_to_cards(mask):
+    """
+    Converts a 52-bit card set mask back to card objects
+
+    :param mask:
+
+    :return: List of cards in ascending index order
+    """
+    return [CARDS[index] for index in range(52) if mask >> index & 1]
+
+
+def permute_suits(mask, permutation):
+    """
+    Relabels the suits of a card set mask
+
+    :param mask: Card set mask
+
+    :param permutation: permutation[s] is the new suit value of suit value s
+
+    :return: Card set mask
+    """
+    permuted = 0
+    for suit in range(4):
+        permuted |= ((mask >> 13 * suit) & 0x1FFF) << 13 * permutation[suit]
+    return permuted
+
+
 class StandardDeck:
     """
     Class that creates the deck of cards containing 52 unique cards, incorporates methods for shuffling the deck and
-    drawing cards.
+    drawing cards. The deck is stored as compact card indices and a position of the next card to draw, so drawing is
+    O(1) and the same deck can be reset and reshuffled in place for every round without allocating anything.
     """
-    def __init__(self):
+    def __init__(self, seed=None):
         """
-        Constructs an empty list which is to be filled with cards in no particular order.
+        Constructs the list of card indices, with the cards in no particular order.
+
+        :param seed: Seed of the deck's own random stream, for reproducible shuffles
         """
-        self.cards = []
+        self.order = []
 
         for suit in Suit:
-            self.cards.append(AceCard(suit))
-            self.cards.append(KingCard(suit))
-            self.cards.append(QueenCard(suit))
-            self.cards.append(JackCard(suit))
-            for value in range(2, 11):
-                self.cards.append(NumberedCard(value, suit))
+            for value in [14, 13, 12, 11] + list(range(2, 11)):   # Aces and face cards first, like a new deck
+                self.order.append(suit.value * 13 + value - 2)
+        self.indices = list(self.order)
+        self.position = 0
+        self.random = Random(seed)
 
-    def shuffle(self):
+    @property
+    def cards(self):
         """
-        Shuffles the deck with the shuffle function
+        The cards left in the deck
+
+        :return: List of cards
+        """
+        return [CARDS[index] for index in self.indices[self.position:]]
+
+    def __len__(self):
         """
-        shuffle(self.cards)
+        Number of cards left in the deck
 
-    def draw(self):
         """
-        Draws the first card of the deck.
+        return len(self.indices) - self.position
 
+    def shuffle(self, seed=None, count=None):
         """
-        return self.cards.pop(0)
+        Shuffles the cards left in the deck with a Fisher-Yates shuffle
+
+        :param seed: Reseeds the deck's random stream first, to reproduce a given shuffle
+
+        :param count: Only randomize the next count cards, which is enough when only those will be drawn
+        """
+        if seed is not None:
+            self.random.seed(seed)
+        indices, random = self.indices, self.random.random
+        end = len(indices)
+        stop = end - 1 if count is None else min(self.position + count, end - 1)
+        for i in range(self.position, stop):
+            j = i + int(random() * (end - i))
+            indices[i], indices[j] = indices[j], indices[i]
+
+    def reset(self):
+        """
+        Puts all drawn cards back in the deck in their original order, keeping removed cards out. A shuffle with a
+        given seed right after a reset always gives the same deck.
+
+        """
+        self.indices[:] = self.order
+        self.position = 0
+
+    def remove(self, cards):
+        """
+        Takes known cards out of the deck for good, e.g. the hole cards and board of a simulation. Also resets the deck.
+
+        :param cards: List of cards
+        """
+        mask = cards_to_mask(cards)
+        self.order = [index for index in self.order if not mask >> index & 1]
+        self.indices = list(self.order)
+        self.position = 0
+
+    def draw_index(self):
+        """
+        Draws the first card of the deck as a compact card index.
+
+        """
+        if self.position >= len(self.indices):
+            raise IndexError("draw from an empty deck")
+        self.position += 1
+        return self.indices[self.position - 1]
+
+    def draw_indices(self, n):
+        """
+        Draws the first n cards of the deck as compact card indices.
+
+        :param n:
+
+        :return: List of indices
+        """
+        if self.position + n > len(self.indices):
+            raise IndexError("draw from an empty deck")
+        self.position += n
+        return self.indices[self.position - n:self.position]
+
+    def draw(self, n=None):
+        """
+        Draws the first card of the deck, or the first n cards as a list.
+
+        :param n: Number of cards to draw, None for a single card
+        """
+        if n is None:
+            return CARDS[self.draw_index()]
+        return [CARDS[index] for index in self.draw_indices(n)]
 
     def __repr__(self):
         """
@@ -217,12 +380,12 @@ class Hand:
     """
     def __init__(self):
         """
-        Construct a hand with cards
+        Construct a hand with cards, and the card set mask of those cards
 
         :param cards:
         """
         self.cards = []
-
+        self.mask = 0
 
     def add_card(self, card):
         """
@@ -231,6 +394,7 @@ class Hand:
         :param card:
         """
         self.cards.append(card)
+        self.mask |= 1 << card.index
 
     def drop_cards(self, indices):
         """
@@ -240,6 +404,15 @@ class Hand:
         """
         for index in sorted(indices, reverse=True):
             del self.cards[index]
+        self.mask = cards_to_mask(self.cards)
+
+    def clear(self):
+        """
+        Removes all cards from the hand
+
+        """
+        self.cards = []
+        self.mask = 0
 
     def sort(self):
         """
@@ -256,7 +429,7 @@ class Hand:
 
         :return: The hand type with it's Enum value and a list with all the cards (cards on hand and cards on table, i.e. 7 cards)
         """
-        return PokerHand(self.cards + cards)
+        return PokerHand.from_mask(self.mask | cards_to_mask(cards))
 
     def __repr__(self):
         """
@@ -302,180 +475,509 @@ class HandType(Enum):
         return self.value == other.value
 
 
-class PokerHand:
+# Lookup tables over 13-bit rank masks (bit 0 is a two, bit 12 is an ace), shared by every evaluator below.
+_RANK_MASKS = 1 << 13
+
+
+def _build_rank_tables():
     """
-    Class that checks the hand type of the poker hand
+    Builds the lookup tables used by the bitmask evaluator.
+
+    :return: popcount, highest rank, straight high card (rank + 1, 0 if no straight) and the top 1-5 ranks packed
+             as 4-bit nibbles for every 13-bit rank mask
     """
-    def __init__(self, cards: list):
+    popcount = [0] * _RANK_MASKS
+    highest = [0] * _RANK_MASKS
+    straight = [0] * _RANK_MASKS
+    top = [[0] * _RANK_MASKS for _ in range(6)]
+    for mask in range(1, _RANK_MASKS):
+        popcount[mask] = popcount[mask >> 1] + (mask & 1)
+        highest[mask] = mask.bit_length() - 1
+        for high in range(12, 3, -1):
+            window = 0x1F << (high - 4)
+            if mask & window == window:
+                straight[mask] = high + 1
+                break
+        else:
+            if mask & 0x100F == 0x100F:     # The wheel, A-2-3-4-5, is a five high straight
+                straight[mask] = 4
+        rest, packed = mask, 0
+        for n in range(1, 6):
+            rank = rest.bit_length() - 1 if rest else 0
+            rest &= ~(1 << rank)
+            packed = (packed << 4) | rank
+            top[n][mask] = packed
+    return popcount, highest, straight, top
+
+
+_POPCOUNT, _HIGHEST, _STRAIGHT, _TOP = _build_rank_tables()
+
+
+def evaluate_suit_masks(suit_masks):
+    """
+    Evaluates a hand given as one 13-bit rank mask per suit. The result is a single integer where the HandType value
+    sits above bit 20 and the deciding ranks follow as 4-bit nibbles, so hands compare with plain integer operators.
+
+    :param suit_masks: Sequence of four rank masks, indexed by Suit value
+
+    :return: Integer rank of the best poker hand
+    """
+    d, c, s, h = suit_masks
+    ranks = d | c | s | h
+    quads = d & c & s & h
+    trips = (d & c & s) | (d & c & h) | (d & s & h) | (c & s & h)
+    pairs = (d & c) | (d & s) | (d & h) | (c & s) | (c & h) | (s & h)
+
+    flush = 0
+    for mask in suit_masks:
+        if _POPCOUNT[mask] >= 5:
+            flush = mask
+            break
+    return _rank(ranks, pairs, trips, quads, flush)
+
+
+def _rank(ranks, pairs, trips, quads, flush):
+    """
+    Ranks a hand from its rank masks
+
+    :param ranks: Ranks present at least once
+
+    :param pairs: Ranks present at least twice
+
+    :param trips: Ranks present at least three times
+
+    :param quads: Ranks present four times
+
+    :param flush: Ranks of the suit with five or more cards, 0 if there is none
+
+    :return: Integer rank of the best poker hand
+    """
+    if flush:
+        high = _STRAIGHT[flush]
+        if high:
+            return (9 << 20) | ((high - 1) << 16)
+    if quads:
+        quad = _HIGHEST[quads]
+        return (8 << 20) | (quad << 16) | (_HIGHEST[ranks & ~(1 << quad)] << 12)
+    if trips:
+        three = _HIGHEST[trips]
+        two = pairs & ~(1 << three)
+        if two:
+            return (7 << 20) | (three << 16) | (_HIGHEST[two] << 12)
+    if flush:
+        return (6 << 20) | _TOP[5][flush]
+    high = _STRAIGHT[ranks]
+    if high:
+        return (5 << 20) | ((high - 1) << 16)
+    if trips:
+        three = _HIGHEST[trips]
+        return (4 << 20) | (three << 16) | (_TOP[2][ranks & ~(1 << three)] << 8)
+    if pairs:
+        first = _HIGHEST[pairs]
+        second = pairs & ~(1 << first)
+        if second:
+            second = _HIGHEST[second]
+            kicker = _HIGHEST[ranks & ~(1 << first) & ~(1 << second)]
+            return (3 << 20) | (first << 16) | (second << 12) | (kicker << 8)
+        return (2 << 20) | (first << 16) | (_TOP[3][ranks & ~(1 << first)] << 4)
+    return (1 << 20) | _TOP[5][ranks]
+
+
+_evaluator = None   # Alternative backend of evaluate_mask and evaluate_batch, see set_evaluator
+
+
+def set_evaluator(backend):
+    """
+    Selects how evaluate_mask and evaluate_batch, and everything built on them, evaluate hands. Every backend gives
+    the same ranks.
+
+    :param backend: Object with evaluate_mask and evaluate_batch methods taking the same arguments, e.g. a
+                    handtable.HandTable, or None for the bit mask evaluator of this module
+
+    :return: The backend used before
+    """
+    global _evaluator
+    previous, _evaluator = _evaluator, backend
+    return previous
+
+
+def evaluate_mask(mask):
+    """
+    Evaluates the best poker hand that can be made from a 52-bit card set mask. Since card indices are
+    suit.value * 13 + value - 2, each suit is a 13-bit slice of the mask.
+
+    :param mask: Card set mask, see cards_to_mask
+
+    :return: Integer rank of the best poker hand, higher is better
+    """
+    if _evaluator is not None:
+        return _evaluator.evaluate_mask(mask)
+    return evaluate_suit_masks((mask & 0x1FFF, (mask >> 13) & 0x1FFF, (mask >> 26) & 0x1FFF, mask >> 39))
+
+
+def evaluate(cards):
+    """
+    Evaluates the best poker hand that can be made from the given cards (typically 5 to 7).
+
+    :param cards: List of cards
+
+    :return: Integer rank of the best poker hand, higher is better
+    """
+    return evaluate_mask(cards_to_mask(cards))
+
+
+class HandEvaluator:
+    """
+    Running evaluation state for a growing set of cards, e.g. hole cards followed by the flop, turn and river. Each
+    added card updates per suit and per rank counts and masks in constant time, so the rank of the best hand so far is
+    available after every street without evaluating all cards again.
+    """
+    __slots__ = ('suit_masks', 'suit_counts', 'rank_counts', 'at_least')
+
+    def __init__(self, cards=()):
         """
-        Construct self.type that represent the highest hand type of the poker hand
+        Constructs the state, optionally with some cards already added
 
         :param cards: List of cards
         """
-        self.cards = cards.sort(reverse=True)
-        checkers = [self.check_straight_flush, self.check_four_of_a_kind, self.check_full_house,
-                    self.check_flush, self.check_straight, self.check_diff_pairs]
+        self.clear()
+        for c in cards:
+            self.add(c)
+
+    def clear(self):
+        """
+        Removes all cards
+
+        """
+        self.suit_masks = [0, 0, 0, 0]
+        self.suit_counts = [0, 0, 0, 0]
+        self.rank_counts = [0] * 13
+        self.at_least = [0, 0, 0, 0, 0]    # at_least[n] is the mask of ranks held n times or more
+
+    def add(self, card):
+        """
+        Adds a card
+
+        :param card:
+        """
+        self.add_index(card.index)
 
-        for checker in checkers:
-            v = checker(cards)
-            if v is not None:
-                self.type, self.values = v
+    def add_index(self, index):
+        """
+        Adds a card given as a compact card index
+
+        :param index:
+        """
+        suit, rank = divmod(index, 13)
+        self.suit_masks[suit] |= 1 << rank
+        self.suit_counts[suit] += 1
+        count = self.rank_counts[rank] = self.rank_counts[rank] + 1
+        self.at_least[count] |= 1 << rank
+
+    def copy(self):
+        """
+        :return: Independent copy of the state
+        """
+        other = HandEvaluator.__new__(HandEvaluator)
+        other.suit_masks = list(self.suit_masks)
+        other.suit_counts = list(self.suit_counts)
+        other.rank_counts = list(self.rank_counts)
+        other.at_least = list(self.at_least)
+        return other
+
+    def rank(self):
+        """
+        :return: Integer rank of the best poker hand of the cards added so far, same as PokerHand.rank
+        """
+        flush = 0
+        for suit in range(4):
+            if self.suit_counts[suit] >= 5:
+                flush = self.suit_masks[suit]
                 break
+        at_least = self.at_least
+        return _rank(at_least[1], at_least[2], at_least[3], at_least[4], flush)
 
-    def __lt__(self, other):
+    def hand_type(self):
         """
-        Less than operator enables comparing magnitude of values.
+        :return: HandType of the best poker hand of the cards added so far
+        """
+        return HandType(self.rank() >> 20)
 
-        :param other:
 
-        :return: True or False
+_numpy_tables = None
+
+
+def numpy_tables():
+    """
+    Converts the rank mask lookup tables to numpy arrays the first time they are needed
+
+    :return: popcount, highest, straight and top lookup arrays, top being a list of arrays
+    """
+    global _numpy_tables
+    if _numpy_tables is None:
+        _import_numpy()
+        _numpy_tables = (_np.array(_POPCOUNT, dtype=_np.int32), _np.array(_HIGHEST, dtype=_np.int32),
+                         _np.array(_STRAIGHT, dtype=_np.int32), [_np.array(t, dtype=_np.int32) for t in _TOP])
+    return _numpy_tables
+
+
+def set_numpy_tables(tables):
+    """
+    Makes evaluate_batch use lookup arrays made elsewhere, e.g. views of shared memory, instead of its own
+
+    :param tables: popcount, highest, straight and top lookup arrays, as given by numpy_tables
+    """
+    global _numpy_tables
+    _import_numpy()
+    _numpy_tables = tables
+
+
+def _import_numpy():
+    global _np
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("evaluate_batch requires numpy") from None
+        _np = numpy
+
+
+def evaluate_batch(cards):
+    """
+    Evaluates many hands in one vectorized call. Gives exactly the same integer ranks as evaluate_mask and
+    PokerHand.rank, but works on whole columns of rank masks with numpy lookup arrays instead of looping in Python.
+    Memory use is a few dozen bytes per hand, so very large inputs should be passed in chunks.
+
+    :param cards: Integer array of shape (N, K) with compact card indices (0-51), typically K = 7
+
+    :return: numpy int32 array with N hand ranks
+    """
+    if _evaluator is not None:
+        return _evaluator.evaluate_batch(cards)
+    popcount, highest, straight, top = numpy_tables()
+    cards = _np.asarray(cards, dtype=_np.int32)
+    bits = _np.left_shift(_np.int32(1), cards % 13)
+    suits = cards // 13
+    d, c, s, h = [_np.bitwise_or.reduce(_np.where(suits == suit, bits, 0), axis=1) for suit in range(4)]
+
+    ranks = d | c | s | h
+    quads = d & c & s & h
+    trips = (d & c & s) | (d & c & h) | (d & s & h) | (c & s & h)
+    pairs = (d & c) | (d & s) | (d & h) | (c & s) | (c & h) | (s & h)
+
+    flush = _np.zeros_like(ranks)
+    for mask in (h, s, c, d):   # Reversed, so that the lowest flush suit wins just like in evaluate_suit_masks
+        flush = _np.where(popcount[mask] >= 5, mask, flush)
+
+    straight_flush = straight[flush]
+    high = straight[ranks]
+    quad = highest[quads]
+    three = highest[trips]
+    full_house_two = pairs & ~(1 << three)
+    first = highest[pairs]
+    second_mask = pairs & ~(1 << first)
+    second = highest[second_mask]
+
+    return _np.select(
+        [straight_flush > 0,
+         quads > 0,
+         (trips > 0) & (full_house_two > 0),
+         flush > 0,
+         high > 0,
+         trips > 0,
+         second_mask > 0,
+         pairs > 0],
+        [(9 << 20) | ((straight_flush - 1) << 16),
+         (8 << 20) | (quad << 16) | (highest[ranks & ~(1 << quad)] << 12),
+         (7 << 20) | (three << 16) | (highest[full_house_two] << 12),
+         (6 << 20) | top[5][flush],
+         (5 << 20) | ((high - 1) << 16),
+         (4 << 20) | (three << 16) | (top[2][ranks & ~(1 << three)] << 8),
+         (3 << 20) | (first << 16) | (second << 12) | (highest[ranks & ~(1 << first) & ~(1 << second)] << 8),
+         (2 << 20) | (first << 16) | (top[3][ranks & ~(1 << first)] << 4)],
+        default=(1 << 20) | top[5][ranks]).astype(_np.int32)
+
+
+# Cache file layout: magic and number of entries, followed by the card set masks as little-endian unsigned 64-bit
+# integers and then their ranks as unsigned 32-bit integers, least recently used first.
+_CACHE_MAGIC = b'EVCA'
+_CACHE_HEADER = struct.Struct('<4sI')
+
+
+class EvaluationCache:
+    """
+    Bounded cache of hand ranks by card set mask, dropping the least recently used entries when it is full. The mask
+    does not depend on the order of the cards, so any 5, 6 or 7 cards are found again however they were put together.
+    All the methods can be called from several threads at once. Hands use it once it is set as PokerHand.cache.
+    """
+    def __init__(self, capacity=1 << 16):
+        """
+        :param capacity: Maximum number of entries, 0 to evaluate every time
         """
-        return (self.type, self.values) < (other.type, other.values)
+        self.capacity = capacity
+        self.ranks = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
 
-    def __eq__(self, other):
+    def rank(self, mask):
         """
-        Equal operator that enables comparing if values are equal
+        Gives the rank of a card set, evaluating it only if it is not in the cache
 
-        :param other:
+        :param mask: Card set mask, see cards_to_mask
 
-        :return: True or False
+        :return: Integer rank, see evaluate_mask
         """
-        return (self.type, self.values) == (other.type, other.values)
+        with self.lock:
+            ranks = self.ranks
+            rank = ranks.get(mask)
+            if rank is not None:
+                ranks.move_to_end(mask)
+                self.hits += 1
+                return rank
+            self.misses += 1
+            rank = ranks[mask] = evaluate_mask(mask)
+            if len(ranks) > self.capacity:
+                self.__evict()
+        return rank
 
-    @staticmethod
-    def check_straight_flush(cards):
+    def __evict(self):
+        while len(self.ranks) > self.capacity:
+            self.ranks.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, capacity):
         """
-        Static method to check if there is a straight flush
+        Changes the maximum number of entries, dropping the least recently used ones that no longer fit
 
-        :param cards: List of cards
+        :param capacity:
+        """
+        with self.lock:
+            self.capacity = capacity
+            self.__evict()
 
-        :return: HandType and list of the considered cards in descending order
+    def clear(self):
         """
-        vals = [(c.get_value(), c.suit) for c in cards] \
-               + [(1, c.suit) for c in cards if c.get_value() == 14]  # Add the aces!
-        for c in reversed(cards):  # Starting point (high card)
-            # Check if we have the value - k in the set of cards:
-            found_straight = True
-            for k in range(1, 5):
-                if (c.get_value() - k, c.suit) not in vals:
-                    found_straight = False
-                    break
-            if found_straight:
-                return HandType.STRAIGHT_FLUSH, cards[0:7]
+        Removes all entries and resets the counters
 
-    @staticmethod
-    def check_four_of_a_kind(cards):
         """
-        Static method to check if there is a four of a kind
+        with self.lock:
+            self.ranks.clear()
+            self.hits = self.misses = self.evictions = 0
 
-        :param cards: List of cards
+    def stats(self):
+        """
+        :return: dict with the hits, misses, evictions, size and capacity
+        """
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'size': len(self.ranks), 'capacity': self.capacity}
 
-        :return: HandType and list of the considered cards in descending order
+    def save(self, path):
         """
-        value_count = Counter()
-        for c in cards:
-            value_count[c.get_value()] += 1
-        # Find the card ranks that have at least four of a kind
-        fours = [v[0] for v in value_count.items() if v[1] >= 4]
-        fours.sort()
-        if fours:
-            return HandType.FOUR_OF_A_KIND, cards[0:7]
+        Writes the entries to a file, e.g. at the end of a long simulation, for load to start from later
 
-    @staticmethod
-    def check_full_house(cards):
+        :param path:
         """
-        Static method to check if there is a full house
+        with self.lock:
+            masks, ranks = array('Q', self.ranks.keys()), array('I', self.ranks.values())
+        if sys.byteorder != 'little':
+            masks.byteswap()
+            ranks.byteswap()
+        with open(path, 'wb') as file:
+            file.write(_CACHE_HEADER.pack(_CACHE_MAGIC, len(masks)))
+            masks.tofile(file)
+            ranks.tofile(file)
 
-        :param cards: List of cards
+    def load(self, path):
+        """
+        Adds the entries of a file written by save, as many of the most recently used ones as fit
+
+        :param path:
 
-        :return: HandType and list of the considered cards in descending order
+        :return: Number of entries read
         """
-        value_count = Counter()
-        for c in cards:
-            value_count[c.get_value()] += 1
-        # Find the card ranks that have at least three of a kind
-        threes = [v[0] for v in value_count.items() if v[1] >= 3]
-        threes.sort()
-        # Find the card ranks that have at least a pair
-        twos = [v[0] for v in value_count.items() if v[1] >= 2]
-        twos.sort()
-        # Threes are dominant in full house, lets check that value first:
-        for three in reversed(threes):
-            for two in reversed(twos):
-                if two != three:
-                    return HandType.FULL_HOUSE, (three, two)
-
-    @staticmethod
-    def check_flush(cards):
-        """
-        Static method to check if there is a flush
+        with open(path, 'rb') as file:
+            magic, count = _CACHE_HEADER.unpack(file.read(_CACHE_HEADER.size))
+            if magic != _CACHE_MAGIC:
+                raise ValueError(f"{path} is not an evaluation cache")
+            masks, ranks = array('Q'), array('I')
+            masks.fromfile(file, count)
+            ranks.fromfile(file, count)
+        if sys.byteorder != 'little':
+            masks.byteswap()
+            ranks.byteswap()
+        with self.lock:
+            self.ranks.update(zip(masks, ranks))
+            self.__evict()
+        return count
+
+
+class PokerHand:
+    """
+    Class that checks the hand type of the poker hand
+    """
+    # Optional EvaluationCache of the ranks of recently evaluated card sets, shared by all hands. Off by default: a
+    # miss costs more than evaluating, so it only pays off when the same cards come up again and again.
+    cache = None
+
+    def __init__(self, cards: list):
+        """
+        Construct self.type that represent the highest hand type of the poker hand, and self.rank that orders it
+        against other poker hands
 
         :param cards: List of cards
+        """
+        self.mask = cards_to_mask(cards)
+        self.rank = self.cache.rank(self.mask) if self.cache is not None else evaluate_mask(self.mask)
+        self.type = HandType(self.rank >> 20)
 
-        :return: HandType and list of the considered cards in descending order
+    @classmethod
+    def from_mask(cls, mask):
         """
-        suits = [c.suit for c in cards]
-        # Find suit if suit is found at least 5 times
-        flush_check = ([item for item, count in Counter(suits).items() if count >= 5])
-        if flush_check:
-            return HandType.FLUSH, cards[0:7]
+        Creates the poker hand directly from a 52-bit card set mask, without going through card objects
+
+        :param mask: Card set mask, see cards_to_mask
 
-    @staticmethod
-    def check_straight(cards):
+        :return: PokerHand
         """
-        Static method to check if there is a straight
+        hand = cls.__new__(cls)
+        hand.mask = mask
+        hand.rank = cls.cache.rank(mask) if cls.cache is not None else evaluate_mask(mask)
+        hand.type = HandType(hand.rank >> 20)
+        return hand
 
-        :param cards: List of cards
+    @property
+    def cards(self):
+        """
+        The cards of the poker hand in descending order
+
+        :return: List of cards
+        """
+        return sorted(mask_to_cards(self.mask), reverse=True)
 
-        :return: HandType and list of the considered cards in descending order
+    def __lt__(self, other):
         """
-        vals = [c.get_value() for c in cards] \
-               + [1 for c in cards if c.get_value() == 14]  # Add the aces!
-        for c in reversed(cards):  # Starting point (high card)
-            # Check if we have the value - k in the set of cards:
-            found_straight = True
-            for k in range(1, 5):
-                if (c.get_value() - k) not in vals:
-                    found_straight = False
-                    break
-            if found_straight:
-                return HandType.STRAIGHT, cards[0:7]
+        Less than operator enables comparing magnitude of values.
+
+        :param other:
 
-    @staticmethod
-    def check_diff_pairs(cards):
+        :return: True or False
         """
-        Static method to check if there is a threes/two pair/pair or just a high card.
+        return self.rank < other.rank
 
-        :param cards: List of cards
+    def __eq__(self, other):
+        """
+        Equal operator that enables comparing if values are equal
+
+        :param other:
 
-        :return: HandType and list of either threes, two pair, pair and then with the considered cards in descending order
-                 if HandType is High card the list that is returned contains only cards in descending order
+        :return: True or False
         """
-        value_count = Counter()
-        for c in cards:
-            value_count[c.get_value()] += 1
-        # Find the card ranks that have at least three of a kind
-        threes = [v[0] for v in value_count.items() if v[1] >= 3]
-        threes.sort()
-        # Find the card ranks that have at least a pair
-        twos = [v[0] for v in value_count.items() if v[1] >= 2]
-        twos.sort(reverse=True)     # Sort the pairs in descending order
-
-        list_of_cards_twos = [twos, cards[0:7]]  # Creates list with the pair/pairs in the first index/indices and then the cards
-        list_of_cards_threes = [threes, cards[0:7]] # Creates list with the threes in the first index and then the cards
-
-        if threes:
-            return HandType.THREE_OF_A_KIND, list_of_cards_threes
-        if twos:
-            if len(twos) == 2:
-                return HandType.TWO_PAIRS, list_of_cards_twos
-            elif len(twos) == 1:
-                return HandType.PAIR, list_of_cards_twos
-        return HandType.HIGH_CARD, cards[0:7]
+        return self.rank == other.rank
 
     def __repr__(self):
         """
         Overloads the __repr__ to print the type of the hand and the cards
 
         """
-        return f"{self.type, self.values}"
+        return f"{self.type, self.cards}"
@@ -0,0 +1,324 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, permutations, product
+import random
+import time
+from cardlib import *
+
+
+class EquityResult:
+    """
+    Win, tie and lose counts for every player over a number of rollouts
+    """
+    def __init__(self, wins, ties, losses, rollouts):
+        """
+        Constructs the result
+
+        :param wins: List with the number of rollouts each player won alone
+
+        :param ties: List with the number of rollouts each player shared the best hand
+
+        :param losses: List with the number of rollouts each player lost
+
+        :param rollouts: Total number of rollouts
+        """
+        self.wins = wins
+        self.ties = ties
+        self.losses = losses
+        self.rollouts = rollouts
+
+    def __add__(self, other):
+        """
+        Merges the counts of two results, e.g. from different workers
+
+        :param other:
+
+        :return: EquityResult
+        """
+        return EquityResult([a + b for a, b in zip(self.wins, other.wins)],
+                            [a + b for a, b in zip(self.ties, other.ties)],
+                            [a + b for a, b in zip(self.losses, other.losses)],
+                            self.rollouts + other.rollouts)
+
+    def win(self, player):
+        """
+        :param player: Index of the player
+
+        :return: Probability that the player wins alone, 0 without rollouts
+        """
+        return self.wins[player] / self.rollouts if self.rollouts else 0.0
+
+    def tie(self, player):
+        """
+        :param player: Index of the player
+
+        :return: Probability that the player splits the pot, 0 without rollouts
+        """
+        return self.ties[player] / self.rollouts if self.rollouts else 0.0
+
+    def lose(self, player):
+        """
+        :param player: Index of the player
+
+        :return: Probability that the player loses, 0 without rollouts
+        """
+        return self.losses[player] / self.rollouts if self.rollouts else 0.0
+
+    def __repr__(self):
+        """
+        Overloads the __repr__ to print win/tie/lose probabilities per player
+
+        """
+        return str([(self.win(i), self.tie(i), self.lose(i)) for i in range(len(self.wins))])
+
+
+def _count_showdown(ranks, wins, ties, losses):
+    """
+    Adds the outcome of one showdown to the counts
+
+    :param ranks: Integer hand rank of every player
+    """
+    best = max(ranks)
+    winners = ranks.count(best)
+    for i, rank in enumerate(ranks):
+        if rank != best:
+            losses[i] += 1
+        elif winners == 1:
+            wins[i] += 1
+        else:
+            ties[i] += 1
+
+
+def _rollouts(hole_masks, board_mask, iterations, seed, deadline=None):
+    """
+    Runs random board completions for one shard of work. This is the function executed in the worker processes.
+
+    :param hole_masks: Card set mask of each player's hole cards
+
+    :param board_mask: Card set mask of the known board cards
+
+    :param iterations: Maximum number of rollouts
+
+    :param seed: Seed of the shard's own random stream
+
+    :param deadline: time.time() after which the shard stops early, or None. The first block of rollouts is always
+        run, so that a shard started late still counts
+
+    :return: EquityResult
+    """
+    known = board_mask
+    for mask in hole_masks:
+        known |= mask
+    deck = StandardDeck(seed)
+    deck.remove(mask_to_cards(known))
+    missing = 5 - bin(board_mask).count('1')
+    n = len(hole_masks)
+    wins, ties, losses = [0] * n, [0] * n, [0] * n
+
+    done = 0
+    while done < iterations:
+        if deadline is not None and done and done % 256 == 0 and time.time() >= deadline:
+            break
+        deck.reset()
+        deck.shuffle(count=missing)
+        board = board_mask
+        for index in deck.draw_indices(missing):
+            board |= 1 << index
+        _count_showdown([evaluate_mask(mask | board) for mask in hole_masks], wins, ties, losses)
+        done += 1
+    return EquityResult(wins, ties, losses, done)
+
+
+def _board_classes(known_masks, missing):
+    """
+    Groups the possible board completions by how many cards of each suit they add. Suit permutations that leave every
+    known card set unchanged map such a group onto an equally valued group, so only one group per orbit has to be
+    enumerated and its counts are weighted by the size of the orbit.
+
+    :param known_masks: Card set masks of the hole cards and the board
+
+    :param missing: Number of board cards to deal
+
+    :return: List of (suit counts, weight)
+    """
+    symmetries = [p for p in permutations(range(4)) if all(permute_suits(m, p) == m for m in known_masks)]
+    known = 0
+    for mask in known_masks:
+        known |= mask
+    left = [13 - bin((known >> 13 * suit) & 0x1FFF).count('1') for suit in range(4)]
+
+    orbits = {}
+    for counts in product(range(missing + 1), repeat=4):
+        if sum(counts) != missing or any(c > n for c, n in zip(counts, left)):
+            continue
+        images = set()
+        for p in symmetries:
+            image = [0] * 4
+            for suit in range(4):
+                image[p[suit]] = counts[suit]
+            images.add(tuple(image))
+        key = min(images)
+        if key not in orbits:
+            orbits[key] = (counts, len(images))
+    return list(orbits.values())
+
+
+def _enumerate_boards(hole_a, hole_b, board_mask, counts, weight, part, parts):
+    """
+    Evaluates every board completion with the given number of cards per suit. This is the function executed in the
+    worker processes; large groups are split in parts on the combinations of their first suit.
+
+    :param hole_a: Card set mask of the first player's hole cards
+
+    :param hole_b: Card set mask of the second player's hole cards
+
+    :param board_mask: Card set mask of the known board cards
+
+    :param counts: Number of cards to add per suit
+
+    :param weight: Number of equivalent groups this one stands for
+
+    :return: Tuple of weighted (first player wins, ties, second player wins)
+    """
+    known = hole_a | hole_b | board_mask
+    suit_combinations = []
+    for suit, count in enumerate(counts):
+        free = [1 << index for index in range(13 * suit, 13 * suit + 13) if not known >> index & 1]
+        suit_combinations.append([sum(cards) for cards in combinations(free, count)])
+    first = next((suit for suit, count in enumerate(counts) if count), 0)
+    suit_combinations[first] = suit_combinations[first][part::parts]
+
+    wins_a = ties = wins_b = 0
+    hand_a, hand_b = hole_a | board_mask, hole_b | board_mask
+    for d, c, s, h in product(*suit_combinations):
+        board = d | c | s | h
+        rank_a = evaluate_mask(hand_a | board)
+        rank_b = evaluate_mask(hand_b | board)
+        if rank_a > rank_b:
+            wins_a += 1
+        elif rank_b > rank_a:
+            wins_b += 1
+        else:
+            ties += 1
+    return wins_a * weight, ties * weight, wins_b * weight
+
+
+class EquityCalculator:
+    """
+    Estimates showdown equity by random rollouts of the remaining board, spread over a pool of worker processes.
+    The work is split in a fixed number of shards, each with its own random stream derived from the seed, so the
+    result for a given seed and iteration count does not depend on the number of processes.
+    """
+    def __init__(self, processes=None, shards=32, tables=None):
+        """
+        Constructs the calculator. The worker pool is started once and reused for every query.
+
+        :param processes: Number of worker processes, None for one per core and 0 to run in this process
+
+        :param shards: Number of independently seeded pieces each query is split into
+
+        :param tables: Optional sharedtables.SharedTables the workers evaluate with, e.g. from publish_tables
+        """
+        self.processes = processes
+        self.shards = shards
+        if processes == 0:
+            self.pool = None
+        elif tables is not None:
+            from sharedtables import attach_worker
+            self.pool = ProcessPoolExecutor(processes, initializer=attach_worker, initargs=(tables.spec(),))
+        else:
+            self.pool = ProcessPoolExecutor(processes)
+
+    def equity(self, hands, board=[], iterations=100000, max_time=None, seed=None):
+        """
+        Estimates win/tie/lose probabilities for the given hole cards
+
+        :param hands: List with the hole cards of each player, e.g. [player.hand.cards for player in game.players]
+
+        :param board: Cards already on the table, e.g. game.table.cards
+
+        :param iterations: Number of rollouts
+
+        :param max_time: Optional time budget in seconds, rollouts stop early when it runs out, though every shard runs
+            at least its first block
+
+        :param seed: Seed for reproducible results
+
+        :return: EquityResult
+        """
+        hole_masks = [cards_to_mask(cards) for cards in hands]
+        board_mask = cards_to_mask(board)
+        root = random.Random(seed)
+        seeds = [root.getrandbits(64) for _ in range(self.shards)]
+        counts = [iterations // self.shards + (shard < iterations % self.shards) for shard in range(self.shards)]
+        deadline = time.time() + max_time if max_time is not None else None
+
+        args = ([hole_masks] * self.shards, [board_mask] * self.shards, counts, seeds, [deadline] * self.shards)
+        results = self.pool.map(_rollouts, *args) if self.pool is not None else map(_rollouts, *args)
+        total = EquityResult([0] * len(hands), [0] * len(hands), [0] * len(hands), 0)
+        for result in results:
+            total += result
+        return total
+
+    def exact(self, hand_a, hand_b, board=[], parts=4):
+        """
+        Computes the exact heads-up result by enumerating every remaining board completion, e.g. the 990 turn and
+        river cards after the flop or the 1,712,304 boards preflop. Suit symmetries of the known cards are used to
+        skip equivalent boards and the rest is spread over the worker processes.
+
+        :param hand_a: Hole cards of the first player
+
+        :param hand_b: Hole cards of the second player
+
+        :param board: Cards already on the table
+
+        :param parts: Number of pieces each group of boards is split into for the workers
+
+        :return: EquityResult with exact counts, rollouts being the number of boards
+        """
+        hole_a, hole_b, board_mask = cards_to_mask(hand_a), cards_to_mask(hand_b), cards_to_mask(board)
+        missing = 5 - len(board)
+        if missing == 0:
+            tasks = [((0, 0, 0, 0), 1, 0, 1)]
+        else:
+            tasks = [(counts, weight, part, parts)
+                     for counts, weight in _board_classes([hole_a, hole_b, board_mask], missing)
+                     for part in range(parts)]
+        args = ([hole_a] * len(tasks), [hole_b] * len(tasks), [board_mask] * len(tasks)) + tuple(zip(*tasks))
+        results = self.pool.map(_enumerate_boards, *args) if self.pool is not None else map(_enumerate_boards, *args)
+
+        wins_a = ties = wins_b = 0
+        for a, t, b in results:
+            wins_a, ties, wins_b = wins_a + a, ties + t, wins_b + b
+        return EquityResult([wins_a, wins_b], [ties, ties], [wins_b, wins_a], wins_a + ties + wins_b)
+
+    def close(self):
+        """
+        Shuts down the worker processes
+
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def game_equity(game, calculator, exact=False, **kwargs):
+    """
+    Estimates the equity of the players of a game in its current state
+
+    :param game: TexasHoldEm
+
+    :param calculator: EquityCalculator
+
+    :param exact: Enumerate every board instead of sampling, only for two players
+
+    :return: EquityResult with one entry per player of the game
+    """
+    hands = [player.hand.cards for player in game.players]
+    if exact:
+        return calculator.exact(*hands, game.table.cards, **kwargs)
+    return calculator.equity(hands, game.table.cards, **kwargs)
@@ -0,0 +1,256 @@
+from array import array
+import argparse
+import mmap
+import os
+import struct
+import sys
+from cardlib import *
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hand_table.bin')
+
+# The table is a state machine over the cards of a hand, in any order. A state takes STRIDE entries: one per card
+# index, holding the offset of the next state, and a last one holding the rank of the cards seen so far. From the
+# states of six cards the card entries hold the rank of the seven cards directly, so a 7-card hand is evaluated with
+# seven lookups and nothing else:
+#   p = 0; for index in cards: p = table[p + index]
+# A state stands for the rank counts of its cards and the exact cards of the suits that can still make a flush with
+# the cards to come, so that 612,977 states cover every hand of up to seven cards. Hands with a card twice lead to
+# the first state or to a rank of 0.
+#
+# File layout: magic, format version and number of states, followed by the states as little-endian unsigned 32-bit
+# integers.
+_MAGIC = b'HTBL'
+_HEADER = struct.Struct('<4sHI')
+STRIDE = 53
+_RANK = 52
+
+
+_SUIT_CARDS = None
+
+
+def _suit_cards():
+    """
+    :return: Lists indexed by suit and 13-bit rank mask, with the card indices of the ranks in the mask
+    """
+    global _SUIT_CARDS
+    if _SUIT_CARDS is None:
+        _SUIT_CARDS = [[[13 * suit + rank for rank in range(13) if mask >> rank & 1] for mask in range(1 << 13)]
+                       for suit in range(4)]
+    return _SUIT_CARDS
+
+
+def _rank(counts, suits):
+    """
+    Ranks a state with the reference evaluator
+
+    :param counts: Number of cards per rank
+
+    :param suits: Rank mask of the cards per suit, None for the suits that can not make a flush any more
+
+    :return: Integer rank, see evaluate_mask
+    """
+    evaluator = HandEvaluator()
+    for suit, mask in enumerate(suits):
+        if mask is not None:
+            evaluator.suit_masks[suit] = mask
+            evaluator.suit_counts[suit] = bin(mask).count('1')
+    for rank, count in enumerate(counts):
+        for n in range(1, count + 1):
+            evaluator.at_least[n] |= 1 << rank
+    return evaluator.rank()
+
+
+def _next_state(counts, suits, index, cards):
+    """
+    Adds a card to a state
+
+    :param cards: Number of cards of the state
+
+    :return: (counts, suits) of the new state, or None if the card is already in the hand
+    """
+    suit, rank = divmod(index, 13)
+    if counts[rank] == 4 or (suits[suit] is not None and suits[suit] >> rank & 1):
+        return None
+    left = 7 - cards - 1    # Cards still to come after this one
+    new_suits = []
+    for s, mask in enumerate(suits):
+        if mask is not None and s == suit:
+            mask |= 1 << rank
+        # A suit without enough cards to make a flush with the cards to come no longer matters
+        new_suits.append(None if mask is None or bin(mask).count('1') + left < 5 else mask)
+    return counts[:rank] + (counts[rank] + 1,) + counts[rank + 1:], tuple(new_suits)
+
+
+def build_table(path=DEFAULT_PATH, report=None):
+    """
+    Generates the state machine from the reference evaluator and writes it to disk. Takes a few minutes.
+
+    :param path: Output file
+
+    :param report: Optional callback called with a progress message after every number of cards
+
+    :return: Number of states
+    """
+    start = ((0,) * 13, (0, 0, 0, 0))
+    states = [start]
+    index = {start: 0}
+    level = [start]
+    for cards in range(6):      # Finds the states of one to six cards
+        new_level = []
+        for counts, suits in level:
+            for card in range(52):
+                state = _next_state(counts, suits, card, cards)
+                if state is not None and state not in index:
+                    index[state] = len(states)
+                    states.append(state)
+                    new_level.append(state)
+        level = new_level
+        if report is not None:
+            report(f"{len(level)} states of {cards + 1} cards")
+
+    table = array('I', bytes(4 * STRIDE * len(states)))
+    final_ranks = {}
+    for number, (counts, suits) in enumerate(states):
+        cards = sum(counts)
+        offset = number * STRIDE
+        table[offset + _RANK] = _rank(counts, suits)
+        for card in range(52):
+            state = _next_state(counts, suits, card, cards)
+            if state is None:
+                continue
+            if cards < 6:
+                table[offset + card] = index[state] * STRIDE
+                continue
+            rank = final_ranks.get(state)
+            if rank is None:
+                rank = final_ranks[state] = _rank(*state)
+            table[offset + card] = rank
+        if report is not None and (number + 1) % 100000 == 0:
+            report(f"{number + 1}/{len(states)} states")
+    if sys.byteorder != 'little':
+        table.byteswap()
+    with open(path, 'wb') as file:
+        file.write(_HEADER.pack(_MAGIC, 1, len(states)))
+        table.tofile(file)
+    return len(states)
+
+
+class HandTable:
+    """
+    Memory-mapped view of a table written by build_table. Every process that opens the file shares the same pages of
+    it, so worker pools need only one physical copy. Can be selected as the evaluator with cardlib.set_evaluator.
+    Its gain is in evaluate_batch, where the lookups of all the hands are done at once; from Python, one hand at a time
+    costs about as much as the bit mask evaluator.
+    """
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Maps the table file into memory
+
+        :param path: File written by build_table
+        """
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, states = _HEADER.unpack_from(self.map)
+        if magic != _MAGIC or version != 1 or len(self.map) != _HEADER.size + 4 * STRIDE * states:
+            raise ValueError(f"{path} is not a hand table")
+        self.array = None   # numpy view for evaluate_batch, made the first time it is needed
+        if sys.byteorder == 'little':
+            self.view = memoryview(self.map)
+            self.values = self.view[_HEADER.size:].cast('I')
+        else:
+            self.view = None
+            self.values = array('I', self.map[_HEADER.size:])
+            self.values.byteswap()
+
+    @classmethod
+    def from_array(cls, values):
+        """
+        Uses a table that is already in memory instead of a file, e.g. a view of shared memory, see sharedtables
+
+        :param values: numpy uint32 array with the entries of the table, as HandTable.array
+
+        :return: HandTable
+        """
+        table = cls.__new__(cls)
+        table.map = table.view = None
+        table.array = values
+        table.values = memoryview(values)
+        return table
+
+    def evaluate(self, indices):
+        """
+        Evaluates a hand given as compact card indices
+
+        :param indices: Up to seven different card indices, e.g. [card.index for card in cards]
+
+        :return: Integer rank, the same as evaluate_mask
+        """
+        values = self.values
+        p = 0
+        for index in indices:
+            p = values[p + index]
+        return p if len(indices) == 7 else values[p + _RANK]
+
+    def evaluate_mask(self, mask):
+        """
+        Evaluates a hand given as a card set mask
+
+        :param mask: Card set mask of up to seven cards, see cards_to_mask
+
+        :return: Integer rank, the same as evaluate_mask
+        """
+        values, suit_cards = self.values, _suit_cards()
+        p = 0
+        for index in suit_cards[0][mask & 0x1FFF]:
+            p = values[p + index]
+        for index in suit_cards[1][(mask >> 13) & 0x1FFF]:
+            p = values[p + index]
+        for index in suit_cards[2][(mask >> 26) & 0x1FFF]:
+            p = values[p + index]
+        for index in suit_cards[3][mask >> 39]:
+            p = values[p + index]
+        return p if bin(mask).count('1') == 7 else values[p + _RANK]
+
+    def evaluate_batch(self, cards):
+        """
+        Evaluates many hands with one array lookup per card, like cardlib.evaluate_batch
+
+        :param cards: Integer array of shape (N, K) with compact card indices (0-51), K up to 7
+
+        :return: numpy int32 array with N hand ranks
+        """
+        import numpy
+        if self.array is None:
+            self.array = numpy.frombuffer(self.map, dtype='<u4', offset=_HEADER.size)
+        cards = numpy.asarray(cards, dtype=numpy.int64)
+        p = numpy.zeros(len(cards), dtype=numpy.int64)
+        for column in range(cards.shape[1]):
+            p = self.array[p + cards[:, column]].astype(numpy.int64)
+        if cards.shape[1] != 7:
+            p = self.array[p + _RANK]
+        return p.astype(numpy.int32)
+
+    def close(self):
+        """
+        Unmaps the file
+
+        """
+        self.array = None
+        if isinstance(self.values, memoryview):
+            self.values.release()
+        if self.view is not None:
+            self.view.release()
+        if self.map is not None:
+            self.map.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the state machine table of the hand evaluator.')
+    parser.add_argument('--output', default=DEFAULT_PATH, help='table file to write')
+    args = parser.parse_args()
+    states = build_table(args.output, report=lambda text: print(text, file=sys.stderr))
+    print(f"Wrote {args.output}, {states} states")
+
+
+if __name__ == '__main__':
+    main()
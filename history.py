@@ -0,0 +1,238 @@
+from queue import SimpleQueue
+from threading import Event, Thread
+import struct
+from pokerengine import GameListener
+
+ACTIONS = ('check', 'bet', 'call', 'fold')
+_ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+# A history file starts with _MAGIC and holds one length-prefixed record per round:
+#   u32 length of the rest of the record, u64 round seed, u8 number of players, u8 index of the blind player
+#   per player: u32 stack before the blind, u8 u8 hole cards (compact card indices, _NO_CARD for players sitting out)
+#   u8 number of board cards, u8 per board card
+#   u16 number of actions, per action: u8 player, u8 action code, u32 amount
+#   per player: u32 stack after the pot was paid out
+_MAGIC = b'THH2'     # THH1 files were recorded under the heads-up betting rules and no longer replay
+_NO_CARD = 0xFF
+_LENGTH = struct.Struct('<I')
+_HEAD = struct.Struct('<QBB')
+_SEAT = struct.Struct('<IBB')
+_COUNT = struct.Struct('<H')
+_ACTION = struct.Struct('<BBI')
+_STACK = struct.Struct('<I')
+
+
+class HandRecord:
+    """
+    Everything needed to replay one round: the seed the deck was shuffled with, the stacks, the cards and the actions
+    """
+    def __init__(self, seed, blind, stacks, hole_cards, board=(), actions=(), final_stacks=()):
+        """
+        Constructs the record
+
+        :param seed: Round seed, see TexasHoldEm.round_seed
+
+        :param blind: Index of the player that paid the blind
+
+        :param stacks: Money of every player before the blind
+
+        :param hole_cards: Two compact card indices per player, none for the players sitting out without money
+
+        :param board: Compact card indices on the table at the end of the round
+
+        :param actions: List of (player index, action, amount)
+
+        :param final_stacks: Money of every player after the pot was paid out
+        """
+        self.seed = seed
+        self.blind = blind
+        self.stacks = list(stacks)
+        self.hole_cards = [list(cards) for cards in hole_cards]
+        self.board = list(board)
+        self.actions = list(actions)
+        self.final_stacks = list(final_stacks)
+
+    def encode(self):
+        """
+        :return: The record in the binary file format, including its length prefix
+        """
+        parts = [_HEAD.pack(self.seed, len(self.stacks), self.blind)]
+        for stack, cards in zip(self.stacks, self.hole_cards):
+            first, second = cards or (_NO_CARD, _NO_CARD)
+            parts.append(_SEAT.pack(stack, first, second))
+        parts.append(bytes([len(self.board)]) + bytes(self.board))
+        parts.append(_COUNT.pack(len(self.actions)))
+        for player, action, amount in self.actions:
+            parts.append(_ACTION.pack(player, _ACTION_CODES[action], amount))
+        for stack in self.final_stacks:
+            parts.append(_STACK.pack(stack))
+        body = b''.join(parts)
+        return _LENGTH.pack(len(body)) + body
+
+    @classmethod
+    def decode(cls, body):
+        """
+        Reads a record from the binary format
+
+        :param body: Record without its length prefix
+
+        :return: HandRecord
+        """
+        seed, players, blind = _HEAD.unpack_from(body)
+        offset = _HEAD.size
+        stacks, hole_cards = [], []
+        for _ in range(players):
+            stack, first, second = _SEAT.unpack_from(body, offset)
+            offset += _SEAT.size
+            stacks.append(stack)
+            hole_cards.append([] if first == _NO_CARD else [first, second])
+        board = list(body[offset + 1:offset + 1 + body[offset]])
+        offset += 1 + len(board)
+        count, = _COUNT.unpack_from(body, offset)
+        offset += _COUNT.size
+        actions = []
+        for _ in range(count):
+            player, code, amount = _ACTION.unpack_from(body, offset)
+            offset += _ACTION.size
+            actions.append((player, ACTIONS[code], amount))
+        final_stacks = [_STACK.unpack_from(body, offset + i * _STACK.size)[0] for i in range(players)]
+        return cls(seed, blind, stacks, hole_cards, board, actions, final_stacks)
+
+    def __repr__(self):
+        """
+        Overloads the __repr__ to print the record fields
+
+        """
+        return f"HandRecord(seed={self.seed}, blind={self.blind}, stacks={self.stacks}, hole_cards={self.hole_cards}, " \
+               f"board={self.board}, actions={self.actions}, final_stacks={self.final_stacks})"
+
+
+class HistoryWriter:
+    """
+    Append-only writer of hand records. Records are handed to a background thread through a queue, so the game loop
+    only pays for encoding a few bytes; the file itself is written with a large buffer.
+    """
+    def __init__(self, path, buffer_size=1 << 20):
+        """
+        Opens the file for appending and starts the writer thread
+
+        :param path: History file, created if it does not exist
+
+        :param buffer_size: Size of the file buffer in bytes
+        """
+        self.file = open(path, 'ab', buffering=buffer_size)
+        if self.file.tell() == 0:
+            self.file.write(_MAGIC)
+        self.queue = SimpleQueue()
+        self.thread = Thread(target=self.__run, daemon=True)
+        self.thread.start()
+
+    def __run(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            if isinstance(data, Event):     # Queued by flush
+                self.file.flush()
+                data.set()
+                continue
+            self.file.write(data)
+        self.file.close()
+
+    def write(self, record):
+        """
+        Queues a record for writing
+
+        :param record: HandRecord
+        """
+        self.queue.put(record.encode())
+
+    def flush(self):
+        """
+        Writes the records queued so far to the file and waits until they are there
+
+        """
+        if self.thread.is_alive():
+            written = Event()
+            self.queue.put(written)
+            written.wait()
+
+    def close(self):
+        """
+        Writes the queued records and closes the file. Closing again does nothing.
+
+        """
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_records(path, buffer_size=1 << 20):
+    """
+    Streams the encoded records of a history file one by one, without decoding them
+
+    :param path: History file
+
+    :param buffer_size: Size of the read buffer in bytes
+
+    :return: Generator of record bodies, see HandRecord.decode
+    """
+    with open(path, 'rb', buffering=buffer_size) as file:
+        if file.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f"{path} is not a hand history file")
+        while True:
+            prefix = file.read(_LENGTH.size)
+            if len(prefix) < _LENGTH.size:
+                return
+            length, = _LENGTH.unpack(prefix)
+            yield file.read(length)
+
+
+def read_hands(path, buffer_size=1 << 20):
+    """
+    Streams the records of a history file one by one, so files of any size are read in constant memory
+
+    :param path: History file
+
+    :param buffer_size: Size of the read buffer in bytes
+
+    :return: Generator of HandRecord
+    """
+    for body in read_records(path, buffer_size):
+        yield HandRecord.decode(body)
+
+
+class HandRecorder(GameListener):
+    """
+    Listener that turns the rounds of a TexasHoldEm game into hand records
+    """
+    def __init__(self, writer):
+        """
+        :param writer: HistoryWriter, or anything with write(record) and flush() methods
+        """
+        self.writer = writer
+        self.record = None
+
+    def on_new_round(self, game):
+        self.record = HandRecord(game.round_seed, game.blind_index,
+                                 [player.money.value + player.betted.value for player in game.players],
+                                 [[card.index for card in player.hand.cards] for player in game.players])
+
+    def on_action(self, game, player, action, amount):
+        self.record.actions.append((player, action, amount))
+
+    def on_round_end(self, game):
+        self.record.board = [card.index for card in game.table.cards]
+        self.record.final_stacks = [player.money.value for player in game.players]
+        self.writer.write(self.record)
+        self.record = None
+
+    def on_game_over(self, game, player):
+        # The program may well end with the game, so the last rounds are written out right away
+        self.writer.flush()
@@ -0,0 +1,214 @@
+import signal
+import sys
+import threading
+import time
+from functools import wraps
+
+# Instrumentation is off by default and then costs nothing: the timing wrappers are only put in place by enable(),
+# which replaces the methods on their classes, and disable() puts the original methods back. Enabling it in a
+# running program is fine. Bound methods taken before keep calling the original methods, so the targets that are
+# connected to signals (CardView.__change_cards) are connected through a method that looks them up on every call.
+
+# Module, class and method of every instrumented operation. Modules that are not imported are skipped, so the
+# views are only instrumented in programs that show them.
+TARGETS = [
+    ('pokerengine', 'TexasHoldEm', 'bet'),
+    ('pokerengine', 'TexasHoldEm', 'call'),
+    ('pokerengine', 'TexasHoldEm', 'check'),
+    ('pokerengine', 'TexasHoldEm', 'fold'),
+    ('pokerengine', 'TexasHoldEm', 'deal'),
+    ('pokerengine', 'TexasHoldEm', 'check_round_winner'),
+    ('cardlib', 'PokerHand', '__init__'),
+    ('cardlib', 'PokerHand', 'from_mask'),
+    ('cardlib', 'HandEvaluator', 'rank'),
+    ('pokerview', 'CardView', '_CardView__change_cards'),
+]
+
+
+class Stats:
+    """
+    Call counts and times per operation
+    """
+    def __init__(self):
+        self.operations = {}    # Name: [calls, total seconds, longest call in seconds]
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds):
+        """
+        Adds one call
+
+        :param name: Operation name
+
+        :param seconds: Time the call took
+        """
+        entry = self.operations.get(name)
+        if entry is None:
+            with self.lock:
+                entry = self.operations.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        if seconds > entry[2]:
+            entry[2] = seconds
+
+    def snapshot(self):
+        """
+        :return: dict from operation name to dict with calls, total, mean and max (in seconds)
+        """
+        with self.lock:
+            items = [(name, list(entry)) for name, entry in self.operations.items()]
+        return {name: {'calls': calls, 'total': total, 'mean': total / calls if calls else 0.0, 'max': longest}
+                for name, (calls, total, longest) in items}
+
+    def reset(self):
+        """
+        Forgets everything recorded so far
+
+        """
+        with self.lock:
+            self.operations = {}
+
+    def report(self):
+        """
+        :return: Text table of the operations, the ones that took the most time first
+        """
+        lines = [f"{'operation':32} {'calls':>10} {'total ms':>12} {'mean us':>10} {'max us':>10}"]
+        for name, entry in sorted(self.snapshot().items(), key=lambda item: -item[1]['total']):
+            lines.append(f"{name:32} {entry['calls']:10} {entry['total'] * 1e3:12.2f} {entry['mean'] * 1e6:10.1f} "
+                         f"{entry['max'] * 1e6:10.1f}")
+        return '\n'.join(lines)
+
+
+STATS = Stats()
+_installed = []     # (class, attribute, original) of the wrapped methods
+_dumper = None
+
+
+def _timed(function, name, stats):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stats.record(name, time.perf_counter() - start)
+    return wrapper
+
+
+def enabled():
+    """
+    :return: True if the instrumentation is in place
+    """
+    return bool(_installed)
+
+
+def enable(targets=TARGETS, stats=STATS):
+    """
+    Puts timing wrappers around the target methods
+
+    :param targets: List of (module, class, method), see TARGETS
+
+    :param stats: Stats to record to
+    """
+    if _installed:
+        return
+    for module_name, class_name, attribute in targets:
+        module = sys.modules.get(module_name)
+        if module is None:
+            continue
+        owner = getattr(module, class_name)
+        original = owner.__dict__[attribute]
+        name = class_name + '.' + attribute.replace(f'_{class_name}__', '')    # Without the private name mangling
+        if isinstance(original, classmethod):
+            wrapped = classmethod(_timed(original.__func__, name, stats))
+        elif isinstance(original, staticmethod):
+            wrapped = staticmethod(_timed(original.__func__, name, stats))
+        else:
+            wrapped = _timed(original, name, stats)
+        setattr(owner, attribute, wrapped)
+        _installed.append((owner, attribute, original))
+
+
+def disable():
+    """
+    Puts the original methods back
+
+    """
+    while _installed:
+        owner, attribute, original = _installed.pop()
+        setattr(owner, attribute, original)
+
+
+def toggle(*_):
+    """
+    Enables the instrumentation if it is off. If it is on, writes the report to stderr and disables it. Takes and
+    ignores any arguments, so that it can be used as a signal handler.
+
+    """
+    if enabled():
+        disable()
+        print(STATS.report(), file=sys.stderr)
+    else:
+        STATS.reset()
+        enable()
+
+
+def install_signal_handler():
+    """
+    Makes SIGUSR1 toggle the instrumentation of a running program, where the platform has that signal
+
+    :return: True if the handler was installed
+    """
+    if not hasattr(signal, 'SIGUSR1'):
+        return False
+    signal.signal(signal.SIGUSR1, toggle)
+    return True
+
+
+class _Dumper(threading.Thread):
+    def __init__(self, interval, path, stats):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.path = path
+        self.stats = stats
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        text = time.strftime('%Y-%m-%d %H:%M:%S') + '\n' + self.stats.report() + '\n'
+        if self.path is None:
+            sys.stderr.write(text)
+        else:
+            with open(self.path, 'a') as file:
+                file.write(text)
+
+
+def start_dump(interval=60.0, path=None, stats=STATS):
+    """
+    Writes the report periodically from a background thread
+
+    :param interval: Seconds between reports
+
+    :param path: File to append the reports to, None for stderr
+
+    :param stats: Stats to report
+    """
+    global _dumper
+    stop_dump()
+    _dumper = _Dumper(interval, path, stats)
+    _dumper.start()
+
+
+def stop_dump():
+    """
+    Stops the periodic report, after writing a last one
+
+    """
+    global _dumper
+    if _dumper is not None:
+        _dumper.stopped.set()
+        _dumper.join()
+        _dumper.dump()
+        _dumper = None
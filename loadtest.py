@@ -0,0 +1,269 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+# Simulated clients play against a server.GameServer, by default one started for the test in its own process, so its
+# memory can be measured without the clients in it. Every client takes a seat, answers the states where it is the
+# active player and measures the time from sending an action to the server's answer: the next state when the action
+# was accepted, or the refusal.
+
+FALLBACK = ('check', 'call', 'fold')    # Tried in turn after a refused action, like simulate.play_action
+
+
+def random_actions(rng):
+    """
+    Picks any action at random
+
+    :param rng: random.Random of the client
+
+    :return: Generator of commands
+    """
+    while True:
+        yield rng.choice(('check', 'call', 'fold', f'bet {rng.choice((50, 100, 200))}'))
+
+
+def scripted_actions(script):
+    """
+    Repeats a fixed list of commands
+
+    :param script: Commands, e.g. ['call', 'check', 'bet 100']
+
+    :return: Generator of commands
+    """
+    while True:
+        yield from script
+
+
+class Stats:
+    """
+    Measurements of all the clients
+    """
+    def __init__(self, clients):
+        """
+        :param clients: Number of clients, ready is set once all of them have been seated
+        """
+        self.latencies = []
+        self.actions = self.refused = self.hands = self.games = self.dropped = 0
+        self.waiting = clients
+        self.ready = asyncio.Event()
+
+    def seated(self):
+        if self.waiting > 0:
+            self.waiting -= 1
+            if self.waiting == 0:
+                self.ready.set()
+
+    def reset(self):
+        """
+        Forgets the measurements made so far
+
+        """
+        self.latencies = []
+        self.actions = self.refused = self.hands = self.games = self.dropped = 0
+
+    def percentile(self, p):
+        """
+        :param p: Percentile, 0 to 100
+
+        :return: Latency in seconds
+        """
+        ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)] if ordered else float('nan')
+
+
+async def client(host, port, name, actions, stats, stop):
+    """
+    Plays as one player until stop is set, joining a new table whenever a game is over
+
+    :param host: Address of the server
+
+    :param port: TCP port of the server
+
+    :param name: Name of the player
+
+    :param actions: Generator of the commands to play
+
+    :param stats: Stats to add the measurements to
+
+    :param stop: asyncio.Event that ends the test
+    """
+    while not stop.is_set():
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(f'join {name}\n'.encode())
+        seat, sent, fallback = None, None, 0
+
+        def act(command):
+            nonlocal sent
+            sent = time.perf_counter()
+            stats.actions += 1
+            writer.write((command + '\n').encode())
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                event = message['event']
+                if event in ('state', 'refused') and sent is not None:
+                    stats.latencies.append(time.perf_counter() - sent)
+                    sent = None
+                if event == 'seated':
+                    seat = message['seat']
+                    stats.seated()
+                elif event == 'state' and message['active'] == seat:
+                    if stop.is_set():
+                        writer.write(b'quit\n')
+                        break
+                    fallback = 0
+                    act(next(actions))
+                elif event == 'refused':
+                    stats.refused += 1
+                    act(FALLBACK[min(fallback, len(FALLBACK) - 1)])
+                    fallback += 1
+                elif event == 'round_end' and seat == 0:
+                    stats.hands += 1
+                elif event == 'game_over':
+                    stats.games += seat == 0
+                    break
+        except ConnectionError:
+            stats.dropped += 1
+        finally:
+            writer.close()
+
+
+def rss(pid):
+    """
+    Resident memory of a process, read from /proc so only available on Linux
+
+    :param pid: Process id
+
+    :return: Bytes, or None if unknown
+    """
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+
+
+def start_server(seed=None, seats=2):
+    """
+    Starts server.py in a child process on a free port
+
+    :param seed: Seed of the games
+
+    :param seats: Players per table
+
+    :return: Tuple of (Popen, port)
+    """
+    command = [sys.executable, '-u', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py'),
+               '--port', '0', '--seats', str(seats)]
+    if seed is not None:
+        command += ['--seed', str(seed)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()    # Listening on host:port
+    return process, int(line.rsplit(':', 1)[1])
+
+
+async def run(tables, duration, host, port, script=None, seed=0, ramp=200, pid=None, seats=2):
+    """
+    Plays games at many tables for a while
+
+    :param tables: Number of tables, seats clients each
+
+    :param duration: Seconds to play once every client is seated
+
+    :param host: Address of the server
+
+    :param port: TCP port of the server
+
+    :param script: Commands every client repeats, None for random actions
+
+    :param seed: Seed of the random actions
+
+    :param ramp: Clients connecting at the same time
+
+    :param pid: Process id of the server, to measure its memory while every table is playing
+
+    :param seats: Players per table, as the server was started with
+
+    :return: Tuple of (Stats, seconds played, server memory in bytes or None)
+    """
+    stats = Stats(seats * tables)
+    stop = asyncio.Event()
+    connecting = asyncio.Semaphore(ramp)
+
+    async def start(number):
+        async with connecting:
+            actions = scripted_actions(script) if script else random_actions(random.Random(seed * 2 ** 32 + number))
+            return asyncio.get_running_loop().create_task(
+                client(host, port, f'Client {number}', actions, stats, stop))
+
+    clients = await asyncio.gather(*(start(number) for number in range(seats * tables)))
+    await stats.ready.wait()
+    stats.reset()   # Only measure while all the tables are playing
+    begin = time.perf_counter()
+    await asyncio.sleep(duration)
+    memory = rss(pid) if pid else None
+    stop.set()
+    elapsed = time.perf_counter() - begin
+    await asyncio.gather(*clients, return_exceptions=True)
+    return stats, elapsed, memory
+
+
+def report(stats, elapsed, tables, memory=None):
+    """
+    :return: Text report of a run
+    """
+    lines = [f"{tables} tables, {elapsed:.1f} s: {stats.hands / elapsed:.1f} hands/s, "
+             f"{stats.actions / elapsed:.1f} actions/s ({stats.refused} refused), "
+             f"{stats.games} games over, {stats.dropped} clients dropped",
+             "latency ms: " + ', '.join(f"p{p} {1000 * stats.percentile(p):.2f}" for p in (50, 90, 99, 99.9))
+             + f", max {1000 * max(stats.latencies, default=float('nan')):.2f}"]
+    if memory is not None:
+        lines.append(f"server memory: {memory / tables / 1024:.1f} KiB per table")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the game server with simulated clients.')
+    parser.add_argument('--tables', type=int, default=1000)
+    parser.add_argument('--seats', type=int, default=2, help='players per table, the same as the server with --connect')
+    parser.add_argument('--duration', type=float, default=10, help='seconds to play once every client is seated')
+    parser.add_argument('--connect', metavar='HOST:PORT', help='test a running server instead of starting one')
+    parser.add_argument('--script', help='comma separated commands every client repeats, e.g. "call,check,bet 100"; '
+                                         'default random actions')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ramp', type=int, default=200, help='clients connecting at the same time')
+    args = parser.parse_args()
+
+    process = None
+    if args.connect:
+        host, _, port = args.connect.rpartition(':')
+        host, port = host or 'localhost', int(port)
+    else:
+        process, port = start_server(args.seed, args.seats)
+        host = '127.0.0.1'
+    baseline = rss(process.pid) if process else None
+    script = [command.strip() for command in args.script.split(',')] if args.script else None
+
+    try:
+        stats, elapsed, memory = asyncio.run(run(args.tables, args.duration, host, port, script, args.seed, args.ramp,
+                                                 process.pid if process else None, args.seats))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+    print(report(stats, elapsed, args.tables, memory - baseline if memory and baseline else None))
+
+
+if __name__ == '__main__':
+    main()
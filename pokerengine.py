@@ -0,0 +1,641 @@
+from contextlib import contextmanager
+from random import Random
+from cardlib import *
+
+
+class Observable:
+    """
+    Base class for the state of the game. Whenever the state changes, changed() is called, which calls every
+    subscribed callback. Front ends either subscribe callbacks or override notify() (like the Qt models do).
+
+    Changes made inside a batch are not reported one by one: the observers are notified once when the outermost batch
+    ends, and only if something changed.
+    """
+    def __init__(self):
+        self.observers = []
+        self.batch_depth = 0
+        self.dirty = False
+
+    def subscribe(self, callback):
+        """
+        Registers a callback that is called without arguments on every change
+
+        :param callback:
+        """
+        self.observers.append(callback)
+
+    def unsubscribe(self, callback):
+        """
+        Removes a callback registered with subscribe
+
+        :param callback:
+        """
+        self.observers.remove(callback)
+
+    def changed(self):
+        """
+        Reports a change, right away or at the end of the current batch
+
+        """
+        if self.batch_depth:
+            self.dirty = True
+        else:
+            self.notify()
+
+    def notify(self):
+        """
+        Notifies the observers that something changed
+
+        """
+        for callback in self.observers:
+            callback()
+
+    def flush(self):
+        """
+        Notifies the observers right away of the changes held back by the current batch, if any
+
+        """
+        if self.dirty:
+            self.dirty = False
+            self.notify()
+
+    def begin_batch(self):
+        self.batch_depth += 1
+
+    def end_batch(self):
+        self.batch_depth -= 1
+        if self.batch_depth == 0 and self.dirty:
+            self.dirty = False
+            self.notify()
+
+
+@contextmanager
+def batch(observables):
+    """
+    Coalesces the changes of some observables, so that each notifies its observers at most once, at the end
+
+    :param observables: Iterable of Observable
+    """
+    observables = list(observables)
+    for observable in observables:
+        observable.begin_batch()
+    try:
+        yield
+    finally:
+        for observable in observables:
+            observable.end_batch()
+
+
+class Money(Observable):
+    def __init__(self, init_val=0):
+        Observable.__init__(self)
+        self.value = init_val
+
+    def __isub__(self, other):
+        self.value -= other
+        self.changed()
+        return self
+
+    def __iadd__(self, other):
+        self.value += other
+        self.changed()
+        return self
+
+    def clear(self):
+        self.value = 0
+        self.changed()
+
+
+class Table(Observable):
+    def __init__(self):
+        Observable.__init__(self)
+        self.cards = []
+
+    def __iter__(self):
+        return iter(self.cards)
+
+    def flipped(self):
+        # This model only flips all or no cards, so we don't care about the index.
+        # Might be different for other games though!
+        return False
+
+    def add_cards(self, cards):
+        self.cards.append(cards)
+        self.changed()
+
+    def clear(self):
+        self.cards = []
+        self.changed()
+
+
+class PlayerHand(Hand, Observable):
+    def __init__(self):
+        Hand.__init__(self)
+        Observable.__init__(self)
+        # Additional state needed by the UI
+        self.flipped_cards = False
+
+    def __iter__(self):
+        return iter(self.cards)
+
+    def flip(self):
+        # Flips over the cards (to hide them)
+        self.flipped_cards = not self.flipped_cards
+        self.changed()
+
+    def set_flipped(self, flipped):
+        # Shows the cards face down (True) or face up (False)
+        if flipped != self.flipped_cards:
+            self.flip()
+
+    def flipped(self):
+        # This model only flips all or no cards, so we don't care about the index.
+        # Might be different for other games though!
+        return self.flipped_cards
+
+    def add_card(self, card):
+        super().add_card(card)
+        self.changed()
+
+    def clear(self):
+        Hand.clear(self)
+        self.changed()
+
+
+class Player:
+    def __init__(self, name):
+        self.name = name
+        self.hand = self.create_hand()
+        self.money = self.create_money(1000)   # Define the amount of money the players start with
+        self.betted = self.create_money()
+        self.previous_bet = self.create_money()
+        self.evaluator = HandEvaluator()    # Hole cards plus the table, updated as cards are dealt
+        self.folded = False     # Out of the current round, also set for players without money when it is dealt
+
+    def create_hand(self):
+        """
+        Creates the hand of the player, front ends override this to use their own models
+
+        :return: PlayerHand
+        """
+        return PlayerHand()
+
+    def create_money(self, init_val=0):
+        """
+        Creates a money counter of the player, front ends override this to use their own models
+
+        :param init_val:
+
+        :return: Money
+        """
+        return Money(init_val)
+
+    def models(self):
+        """
+        :return: The observable state of the player
+        """
+        return self.hand, self.money, self.betted, self.previous_bet
+
+    def place_bet(self, amount):
+        self.money -= amount
+        self.betted += amount
+
+    def receive_pot(self, amount):
+        self.money += amount
+
+    def clear(self):
+        self.hand.clear()
+        self.betted.clear()
+        self.evaluator.clear()
+        self.folded = False
+
+    def hand_rank(self):
+        """
+        The strength of the player's best poker hand with the cards dealt so far
+
+        :return: Integer rank, see PokerHand.rank
+        """
+        return self.evaluator.rank()
+
+    def set_active(self, active):
+        self.active = active
+
+    def clear_money(self):
+        self.money.clear()
+
+
+class GameListener:
+    """
+    Observer interface of TexasHoldEm. Subclass it and override the events of interest.
+    """
+    def on_active_player_changed(self, game):
+        """
+        Called when the turn passes to another player
+
+        :param game: TexasHoldEm
+        """
+
+    def on_new_round(self, game):
+        """
+        Called when the hole cards and the blind of a new round have been dealt
+
+        :param game: TexasHoldEm
+        """
+
+    def on_action(self, game, player, action, amount):
+        """
+        Called when an action is accepted, before it takes effect
+
+        :param game: TexasHoldEm
+
+        :param player: Index of the acting player
+
+        :param action: 'check', 'bet', 'call' or 'fold'
+
+        :param amount: Chips put in the pot by the action
+        """
+
+    def on_round_end(self, game):
+        """
+        Called when the pot of a round has been paid out, before the next round is dealt
+
+        :param game: TexasHoldEm
+        """
+
+    def on_message(self, game, text):
+        """
+        Called with messages for the players, e.g. the winner of a round or why an action was refused
+
+        :param game: TexasHoldEm
+
+        :param text:
+        """
+
+    def on_game_over(self, game, player):
+        """
+        Called when a player is out of money, after which the game does not start new rounds
+
+        :param game: TexasHoldEm
+
+        :param player: The player that is out of money
+        """
+
+
+class TexasHoldEm:
+    """
+    The rules of the game, without any user interface. Front ends follow it through GameListener events and by
+    observing the pot, table and player models. The actions (check, bet, call and fold) return whether they were
+    allowed, so that programs driving the game do not have to parse the messages.
+    """
+    def __init__(self, players, listeners=(), seed=None, active_player=0):
+        """
+        Sets up the game and deals the first round
+
+        :param players: List of Player
+
+        :param listeners: GameListeners to notify
+
+        :param seed: Seed of the game, for reproducible games. Every round draws its own seed from it, see round_seed
+
+        :param active_player: Index of the player before the first blind, the next player with money pays it
+        """
+        self.players = players
+        self.listeners = list(listeners)
+        self.active_player = active_player
+        self.blind_index = active_player    # The first blind is paid by the next player with money
+        self.acted = set()
+        self.out = []   # Players that ran out of money, in that order
+        self.game_over = False
+        self.pot = self.create_money()
+        self.table = self.create_table()
+        self.random = Random(seed)
+        self.deck = StandardDeck()  # The same deck is reset and reshuffled every round
+        with self.batch():
+            self.__new_round()  # Initializes a new round when program is launched
+
+    def create_money(self):
+        """
+        Creates the pot, front ends override this to use their own models
+
+        :return: Money
+        """
+        return Money()
+
+    def create_table(self):
+        """
+        Creates the table cards, front ends override this to use their own models
+
+        :return: Table
+        """
+        return Table()
+
+    def models(self):
+        """
+        :return: Every observable of the game: the pot, the table and the state of the players
+        """
+        models = [self.pot, self.table]
+        for player in self.players:
+            models.extend(player.models())
+        return models
+
+    def batch(self):
+        """
+        Context manager that holds back the change notifications of every model until it exits, so that an action
+        notifies each model at most once however many steps it takes
+
+        """
+        return batch(self.models())
+
+    def flush(self):
+        """
+        Notifies the changes made so far in the current batch, so that the views show them before an event that
+        interrupts the game, like a message box
+
+        """
+        for model in self.models():
+            model.flush()
+
+    def message(self, text):
+        """
+        Sends a message to the listeners, once the models are up to date
+
+        :param text:
+        """
+        self.flush()
+        for listener in self.listeners:
+            listener.on_message(self, text)
+
+    def action(self, action, amount):
+        """
+        Reports an accepted action of the active player to the listeners
+
+        :param action: 'check', 'bet', 'call' or 'fold'
+
+        :param amount: Chips the action puts in the pot
+        """
+        for listener in self.listeners:
+            listener.on_action(self, self.active_player, action, amount)
+
+    def end_round(self):
+        """
+        Reports to the listeners that the pot has been paid out, once the models are up to date
+
+        """
+        self.flush()
+        for listener in self.listeners:
+            listener.on_round_end(self)
+
+    def next_round_seed(self):
+        """
+        Gives the seed the deck of the next round is shuffled with
+
+        :return: 64-bit seed
+        """
+        return self.random.getrandbits(64)
+
+    def __new_round(self):
+        if self.loser():    # Checks if someone is out of money and therefore the game is ended.
+            return
+        self.pot.clear()
+        self.table.clear()
+        self.round_seed = self.next_round_seed()   # Enough to deal this round again, e.g. from a hand history
+        self.deck.reset()
+        self.deck.shuffle(self.round_seed)
+
+        for player in self.players:
+            player.clear()
+            if player.money.value <= 0:     # Players without money sit the round out
+                player.folded = True
+                continue
+            for card in self.deck.draw(2):
+                player.hand.add_card(card)
+                player.evaluator.add(card)
+
+        # The blind moves on to the next player with money every round
+        self.blind_index = self.next_player(self.blind_index, lambda player: not player.folded)
+        self.blind(self.players[self.blind_index])
+        self.acted = set()  # Players that acted since the last bet of the street
+        self.active_player = self.blind_index
+        for listener in self.listeners:
+            listener.on_new_round(self)
+        self.change_active_player()
+
+    def next_player(self, index, condition):
+        """
+        Finds the first player after a seat, going round the table, that satisfies a condition
+
+        :param index: Seat to start after
+
+        :param condition: Function of a Player
+
+        :return: Index of the player, or the seat itself if no other player satisfies it
+        """
+        count = len(self.players)
+        for step in range(1, count + 1):
+            seat = (index + step) % count
+            if condition(self.players[seat]):
+                return seat
+        return index
+
+    def can_act(self, player):
+        """
+        :param player: Player
+
+        :return: True if the player is still in the round and not all in
+        """
+        return not player.folded and player.money.value > 0
+
+    def max_bet(self):
+        return max(player.betted.value for player in self.players)
+
+    def deal(self, number_of_cards: int):
+        for card in self.deck.draw(number_of_cards):
+            self.table.add_cards(card)
+            for player in self.players:
+                player.evaluator.add(card)
+        self.table.changed()
+
+    def check(self):
+        if self.players[self.active_player].betted.value != self.max_bet():
+            self.message("You cannot check, call or raise")
+            return False
+        with self.batch():
+            self.action('check', 0)
+            self.acted.add(self.active_player)
+            self.advance()
+        return True
+
+    def bet(self, amount: int):
+        player = self.players[self.active_player]
+        if player.money.value <= 0:
+            self.message("You are out of money")
+            return False
+        minimum_allowed_bet, money = self.allowed_bets()
+        if amount <= minimum_allowed_bet:
+            self.message("Bet to low try again")
+            return False
+        if amount > money:
+            self.message("You cannot bet more than you have")
+            return False
+        with self.batch():
+            self.action('bet', amount)
+            self.pot += amount
+            player.place_bet(amount)
+            self.acted = {self.active_player}   # Everyone else has to answer the raise
+            self.advance()
+        return True
+
+    def allowed_bets(self):
+        minimum_allowed_bet = self.max_bet() - self.players[self.active_player].betted.value
+        return minimum_allowed_bet, self.players[self.active_player].money.value
+
+    def call(self):
+        player = self.players[self.active_player]
+        amount = min(self.max_bet() - player.betted.value, player.money.value)     # Short stacks call all in
+        if amount > 0:     # Proceeds if a call is possible otherwise a message is provided.
+            with self.batch():
+                self.action('call', amount)
+                self.pot += amount
+                player.place_bet(amount)
+                self.acted.add(self.active_player)
+                self.advance()
+            return True
+        else:
+            self.message("You cannot call!")
+            return False
+
+    def fold(self):
+        with self.batch():
+            self.action('fold', 0)
+            self.players[self.active_player].folded = True
+            self.advance()
+        return True
+
+    def advance(self):
+        """
+        Moves the round on after an action: to the next player, the next street, the showdown or, when everyone else
+        folded, straight to paying the last player
+
+        """
+        live = [seat for seat, player in enumerate(self.players) if not player.folded]
+        if len(live) == 1:
+            winner = self.players[live[0]]
+            winner.receive_pot(self.pot.value)
+            self.message(winner.name + ' won $ ' + str(self.pot.value))
+            self.end_round()
+            self.__new_round()
+            return
+
+        max_bet = self.max_bet()
+        waiting = [seat for seat in live if self.can_act(self.players[seat])
+                   and (seat not in self.acted or self.players[seat].betted.value != max_bet)]
+        if waiting:
+            self.change_active_player()
+            return
+
+        # The street is over. Without at least two players left to bet, the remaining cards are dealt right away.
+        while True:
+            if len(self.table.cards) == 5:
+                self.check_round_winner()
+                return
+            self.deal(3 if not self.table.cards else 1)
+            self.acted = set()
+            if sum(self.can_act(self.players[seat]) for seat in live) >= 2:
+                break
+        self.active_player = (self.blind_index - 1) % len(self.players)    # The first after the blind starts
+        self.change_active_player()
+
+    def check_round_winner(self):
+        # Ranks every player still in the round in one pass, kept up to date street by street as the cards were dealt,
+        # and sorts them once, strongest first
+        contenders = sorted((seat for seat, player in enumerate(self.players) if not player.folded),
+                            key=lambda seat: self.players[seat].hand_rank(), reverse=True)
+        ranks = {seat: self.players[seat].hand_rank() for seat in contenders}
+
+        for amount, winners in self.side_pots(contenders, ranks):
+            share, odd_chips = divmod(amount, len(winners))
+            for i, seat in enumerate(winners):  # Chips that do not split go to the first winners after the blind
+                self.players[seat].receive_pot(share + (i < odd_chips))
+            if len(winners) == 1:
+                self.message(self.players[winners[0]].name + ' won $ ' + str(amount))
+            else:
+                self.message('Draw! $ ' + str(amount) + ' splits between ' +
+                             ', '.join(self.players[seat].name for seat in winners))
+
+        self.end_round()
+        self.__new_round()
+
+    def side_pots(self, contenders, ranks):
+        """
+        Splits the pot into a main pot and the side pots of players that went all in for less, and finds who wins
+        each. Every pot holds what the players put in up to one all-in level, and only the players that put in at
+        least that much can win it.
+
+        :param contenders: Seats of the players in the showdown, strongest hand first
+
+        :param ranks: Hand rank by seat
+
+        :return: List of (amount, seats of the winners in order from the blind)
+        """
+        bets = [player.betted.value for player in self.players]
+        count = len(self.players)
+        pots = []
+        previous = 0
+        for level in sorted({bets[seat] for seat in contenders}):
+            amount = sum(min(bet, level) - min(bet, previous) for bet in bets)
+            eligible = [seat for seat in contenders if bets[seat] >= level]
+            best = ranks[eligible[0]]
+            winners = sorted((seat for seat in eligible if ranks[seat] == best),
+                             key=lambda seat: (seat - self.blind_index - 1) % count)
+            if pots and pots[-1][1] == winners:     # Levels won by the same players are paid as one pot
+                pots[-1] = (pots[-1][0] + amount, winners)
+            elif amount:
+                pots.append((amount, winners))
+            previous = level
+        leftover = sum(bets) - sum(amount for amount, _ in pots)
+        if leftover and pots:   # Bets above every contender's, only possible if they were never called
+            pots[-1] = (pots[-1][0] + leftover, pots[-1][1])
+        return pots
+
+    def loser(self):
+        """
+        Checks if a player is out of money, which ends the game once fewer than two players have money left
+
+        :return: True if the game is over
+        """
+        for player in self.players:
+            if player.money.value <= 0 and player not in self.out:
+                self.out.append(player)
+                self.message(player.name + " is out of money" +
+                             (", game ends!" if sum(p.money.value > 0 for p in self.players) < 2 else "!"))
+        if sum(player.money.value > 0 for player in self.players) < 2:
+            self.game_over = True
+            self.flush()
+            for listener in self.listeners:
+                listener.on_game_over(self, self.out[-1])
+            return True
+        return False
+
+    def change_active_player(self):
+        """
+        Method to change the player and show who's the active player, also saving the amount of money the active player
+        has, which is useful for setting a maximum bet in the view. Only the active player's cards are shown face up.
+        """
+
+        self.players[self.active_player].set_active(False)
+        self.active_player = self.next_player(self.active_player, self.can_act)
+        active = self.players[self.active_player]
+        active.set_active(True)
+
+        self.the_active_player_name = str(active.name) + '\'s turn'
+        self.the_active_player_money = active.money.value
+        for listener in self.listeners:
+            listener.on_active_player_changed(self)
+        for seat, player in enumerate(self.players):
+            player.hand.set_flipped(seat != self.active_player)
+
+    def blind(self, blind_player):
+        amount = min(50, blind_player.money.value)  # A short stack goes all in for the blind
+        self.pot += amount
+        blind_player.place_bet(amount)
+        self.blind_player_name = blind_player.name
@@ -1,14 +1,44 @@
 from pokerview import *
+from history import HandRecorder, HistoryWriter
+import argparse
+import instrumentation
 import sys
 
 
 def main():
-    qt_app = QApplication(sys.argv)
-    game = TexasHoldEm([Player('Maximilian'), Player('Axel')])
+    parser = argparse.ArgumentParser(description="Texas Hold'em for two players.")
+    parser.add_argument('--history', help='append a record of every round to this hand history file')
+    parser.add_argument('--connect', metavar='HOST:PORT', help='play at a table of a game server, see server.py')
+    parser.add_argument('--name', default='Maximilian', help='name of the player at the server')
+    parser.add_argument('--raster', action='store_true', help='draw the cards from cached pixmaps instead of SVGs')
+    parser.add_argument('--profile', type=float, metavar='SECONDS',
+                        help='time the game operations and report them to stderr every SECONDS; '
+                             'SIGUSR1 turns this on and off while playing')
+    args, qt_args = parser.parse_known_args()
+
+    qt_app = QApplication(sys.argv[:1] + qt_args)
+    CardView.raster = args.raster
+    instrumentation.install_signal_handler()
+    if args.profile:
+        instrumentation.enable()
+        instrumentation.start_dump(args.profile)
+    writer = HistoryWriter(args.history) if args.history else None
+    listeners = [HandRecorder(writer)] if writer else []
+    if args.connect:
+        host, _, port = args.connect.rpartition(':')
+        game = RemoteGame(host or 'localhost', int(port), args.name)
+    else:
+        game = TexasHoldEm([Player('Maximilian'), Player('Axel')], listeners)
     win = MyWindow(game)
     win.show()
 
-    qt_app.exec_()
+    try:
+        qt_app.exec_()
+    finally:
+        if writer:
+            writer.close()
+        if args.profile:
+            instrumentation.stop_dump()
 
 
 if __name__ == '__main__':
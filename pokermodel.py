@@ -1,8 +1,15 @@
 from PyQt5.QtCore import *
+from PyQt5.QtNetwork import QTcpSocket
 import abc
+import json
 from cardlib import *
+import pokerengine
+import replay
 
 
+# The rules live in pokerengine, which has no Qt dependency. The classes below are thin adapters that turn its
+# change notifications into the Qt signals the views listen to.
+
 class CardModel(QObject):
     """ Base class that described what is expected from the CardView widget """
 
@@ -17,252 +24,191 @@ class CardModel(QObject):
         """Returns true of cards should be drawn face down"""
 
 
-class TableModel(CardModel):
+class TableModel(pokerengine.Table, CardModel):
     def __init__(self):
+        pokerengine.Table.__init__(self)
         CardModel.__init__(self)
-        self.cards = []
 
-    def __iter__(self):
-        return iter(self.cards)
+    def notify(self):
+        self.new_cards.emit()  # something changed, better emit the signal!
 
-    def flipped(self):
-        # This model only flips all or no cards, so we don't care about the index.
-        # Might be different for other games though!
-        return False
 
-    def add_cards(self, cards):
-        self.cards.append(cards)
+class HandModel(pokerengine.PlayerHand, CardModel):
+    def __init__(self):
+        pokerengine.PlayerHand.__init__(self)
+        CardModel.__init__(self)
+
+    def notify(self):
         self.new_cards.emit()  # something changed, better emit the signal!
 
-    def clear(self):
-        self.cards = []
-        self.new_cards.emit()
 
+class MoneyModel(pokerengine.Money, QObject):
+    new_value = pyqtSignal()
 
-class HandModel(Hand, CardModel):
-    def __init__(self):
-        Hand.__init__(self)
-        CardModel.__init__(self)
-        # Additional state needed by the UI
-        self.flipped_cards = False
+    def __init__(self, init_val=0):
+        QObject.__init__(self)
+        pokerengine.Money.__init__(self, init_val)
 
-    def __iter__(self):
-        return iter(self.cards)
+    def notify(self):
+        self.new_value.emit()
 
-    def flip(self):
-        # Flips over the cards (to hide them)
-        self.flipped_cards = not self.flipped_cards
-        self.new_cards.emit()  # something changed, better emit the signal!
 
-    def flipped(self):
-        # This model only flips all or no cards, so we don't care about the index.
-        # Might be different for other games though!
-        return self.flipped_cards
+class Player(pokerengine.Player, QObject):
+    def __init__(self, name):
+        QObject.__init__(self)
+        pokerengine.Player.__init__(self, name)
 
-    def add_card(self, card):
-        super().add_card(card)
-        self.new_cards.emit()  # something changed, better emit the signal!
+    def create_hand(self):
+        return HandModel()
 
-    def clear(self):
-        self.cards = []
-        self.new_cards.emit()
+    def create_money(self, init_val=0):
+        return MoneyModel(init_val)
 
 
-class MoneyModel(QObject):
-    new_value = pyqtSignal()
+class TexasHoldEm(pokerengine.TexasHoldEm, pokerengine.GameListener, QObject):
 
-    def __init__(self, init_val=0):
-        super().__init__()
-        self.value = init_val
+    active_player_changed = pyqtSignal()    # Signal only handling when the active player is changed.
+    game_message = pyqtSignal((str,))       # Signal handling game messages
 
-    def __isub__(self, other):
-        self.value -= other
-        self.new_value.emit()
-        return self
+    def __init__(self, players, listeners=(), **kwargs):
+        QObject.__init__(self)
+        pokerengine.TexasHoldEm.__init__(self, players, listeners=[self, *listeners], **kwargs)
 
-    def __iadd__(self, other):
-        self.value += other
-        self.new_value.emit()
-        return self
+    def create_money(self):
+        return MoneyModel()
 
-    def clear(self):
-        self.value = 0
-        self.new_value.emit()
+    def create_table(self):
+        return TableModel()
 
+    def on_active_player_changed(self, game):
+        self.active_player_changed.emit()
 
-class Player(QObject):
-    def __init__(self, name):
-        super().__init__()
-        self.name = name
-        self.hand = HandModel()
-        self.money = MoneyModel(1000)   # Define the amount of money the players start with
-        self.betted = MoneyModel()
-        self.previous_bet = MoneyModel()
+    def on_message(self, game, text):
+        self.game_message.emit(text)
 
-    def place_bet(self, amount):
-        self.money -= amount
-        self.betted += amount
+    def on_game_over(self, game, player):
+        QCoreApplication.quit()     # Leaves the event loop, so the program can clean up before it ends
 
-    def receive_pot(self, amount):
-        self.money += amount
 
-    def clear(self):
-        self.hand.clear()
-        self.betted.clear()
+class ReplayModel(replay.ReplayGame, TexasHoldEm):
+    """ A recorded round replayed on the Qt models, see replay.ReplayGame """
 
-    def set_active(self, active):
-        self.active = active
+    def __init__(self, record, listeners=()):
+        players = [Player(f'Player {seat + 1}') for seat in range(len(record.stacks))]
+        super().__init__(record, players, listeners)
 
-    def clear_money(self):
-        self.money.clear()
 
+class RemoteGame(QObject):
+    """
+    A game played on a server.GameServer, with the interface of TexasHoldEm that the views use. The actions are sent
+    to the server and the models are updated from the states it sends back, so the window acts as one of its clients.
+    """
 
-class TexasHoldEm(QObject):
+    active_player_changed = pyqtSignal()
+    game_message = pyqtSignal((str,))
 
-    active_player_changed = pyqtSignal()    # Signal only handling when the active player is changed.
-    game_message = pyqtSignal((str,))       # Signal handling game messages
+    def __init__(self, host, port, name, timeout=30000):
+        """
+        Connects, takes a seat and waits until the table is full, so the players are known when the views are built
+
+        :param host: Address of the server
 
-    def __init__(self, players):
+        :param port: TCP port of the server
+
+        :param name: Name of the player
+
+        :param timeout: Milliseconds to wait for the connection and for the other players
+        """
         super().__init__()
-        self.players = players
-        self.active_player = 0
+        self.seat = None
+        self.game_over = False
+        self.socket = QTcpSocket(self)
+        self.socket.connectToHost(host, port)
+        if not self.socket.waitForConnected(timeout):
+            raise ConnectionError(f'Could not connect to {host}:{port}: {self.socket.errorString()}')
+        self.send('join ' + name)
+
+        names = None
+        while names is None:
+            if not self.socket.canReadLine() and not self.socket.waitForReadyRead(timeout):
+                raise ConnectionError('No table started in time')
+            while names is None and self.socket.canReadLine():
+                message = self.read_message()
+                if message['event'] == 'seated':
+                    self.seat = message['seat']
+                elif message['event'] == 'start':
+                    names = message['names']
+
+        self.players = [Player(name) for name in names]
         self.pot = MoneyModel()
         self.table = TableModel()
-        self.__new_round()  # Initializes a new round when program is launched
-
-    def __new_round(self):
-        self.loser()    # Checks if someone is out of money and therefore the game is ended.
-        self.check_counter = 0
-        self.pot.clear()
-        self.table.clear()
-        self.deck = StandardDeck()
-        self.deck.shuffle()
-        self.players[self.active_player].set_active(True)
-
-        for player in self.players:
-            player.clear()
-            player.hand.add_card(self.deck.draw())
-            player.hand.add_card(self.deck.draw())
-
-        self.change_active_player()
-        self.blind(self.players[self.active_player])
-        self.players[self.active_player].hand.flip()
-        self.change_active_player()
-        self.check()
-
-    def deal(self, number_of_cards: int):
-        for card in range(number_of_cards):
-            self.table.add_cards(self.deck.draw())
-        self.table.new_cards.emit()
+        self.active_player = self.blind_index = 0
+        self.the_active_player_name = ''
+        self.the_active_player_money = 0
+        self.blind_player_name = ''
+        self.socket.readyRead.connect(self.__receive)
+        self.__receive()    # The first state may have arrived together with the start message
+
+    def send(self, command):
+        self.socket.write((command + '\n').encode())
+
+    def read_message(self):
+        return json.loads(bytes(self.socket.readLine()).decode())
+
+    def __receive(self):
+        while self.socket.canReadLine():
+            message = self.read_message()
+            event = message['event']
+            if event == 'state':
+                self.__update(message)
+            elif event in ('message', 'refused', 'error'):
+                self.game_message.emit(message['text'])
+            elif event == 'game_over':
+                self.game_over = True
+                self.game_message.emit(message['text'])
+                QCoreApplication.quit()
+
+    def __update(self, state):
+        self.pot.value = state['pot']
+        self.pot.changed()
+        self.table.cards = [CARDS[index] for index in state['board']]
+        self.table.changed()
+        for player, seat in zip(self.players, state['players']):
+            player.money.value = seat['money']
+            player.money.changed()
+            player.betted.value = seat['betted']
+            player.betted.changed()
+            player.folded = seat['folded']
+            hand = player.hand
+            Hand.clear(hand)
+            # The other players' cards are not sent (None), only their backs are shown. A seat sitting the round out
+            # has no cards ([]) and shows none.
+            hidden = seat['cards'] is None
+            for index in (0, 0) if hidden else seat['cards']:
+                Hand.add_card(hand, CARDS[index])
+            hand.flipped_cards = hidden
+            hand.changed()
+        self.active_player = state['active']
+        self.blind_index = state['blind']
+        active = self.players[self.active_player]
+        self.the_active_player_name = active.name + '\'s turn'
+        self.the_active_player_money = active.money.value
+        self.blind_player_name = self.players[self.blind_index].name
+        self.active_player_changed.emit()
 
     def check(self):
-        min_bet = min([player.betted.value for player in self.players])
-        max_bet = max([player.betted.value for player in self.players])
-        diff = max_bet - min_bet
-        if diff != 0:
-            self.game_message.emit("You cannot check, call or raise")
-        else:
-            if self.check_counter == 2:     # After both players checks the first time the flop is dealt
-                self.deal(3)
-            elif self.check_counter == 4 or self.check_counter == 6:    # After both check again another card is dealt
-                self.deal(1)
-            elif self.check_counter == 8:  # When all 5 cards is on the table and both players check, winner is checked.
-                self.check_round_winner()
-                self.players[self.active_player].hand.flip()
-
-            self.check_counter += 1
-            self.change_active_player()
-
-    def bet(self, amount: int):
-        if self.players[self.active_player].money.value <= 0:
-            self.game_message.emit("You are out of money")
-        else:
-            max_bet = max([player.betted.value for player in self.players])
-            minimum_allowed_bet = max_bet - self.players[self.active_player].betted.value
-            # minimum_allowed_bet = self.allowed_bets()
-            if amount <= minimum_allowed_bet:
-                self.game_message.emit("Bet to low try again")
-                return
-            self.pot += amount
-            self.players[self.active_player].place_bet(amount)
-            self.change_active_player()
-
-    def allowed_bets(self):
-        max_bet = max([player.betted.value for player in self.players])
-        minimum_allowed_bet = max_bet - self.players[self.active_player].betted.value
-        return minimum_allowed_bet, self.players[self.active_player].money.value
-
+        self.send('check')
 
     def call(self):
-        max_bet = max([player.betted.value for player in self.players])
-        amount = max_bet - self.players[self.active_player].betted.value
-        if amount != 0:     # Proceeds if a call is possible otherwise a message is provided.
-            self.pot += amount
-            self.players[self.active_player].place_bet(amount)
-            self.change_active_player()
-        else:
-            self.game_message.emit("You cannot call!")
+        self.send('call')
 
     def fold(self):
-        self.change_active_player()
-        self.players[self.active_player].receive_pot(self.pot.value)
-        self.game_message.emit(self.players[self.active_player].name + ' won $ ' + str(self.pot.value))
-        self.__new_round()
-        self.players[self.active_player].hand.flip()
-
-    def check_round_winner(self):
-        best_poker_hands = [player.hand.best_poker_hand(self.table.cards) for player in self.players]   # Saves both
-        # player's best poker hands in a list
-
-        if best_poker_hands[0] > best_poker_hands[1]:
-            self.players[0].receive_pot(self.pot.value)
-            self.game_message.emit(self.players[0].name + ' won $ ' + str(self.pot.value))
-
-        elif best_poker_hands[1] > best_poker_hands[0]:
-            self.players[1].receive_pot(self.pot.value)
-            self.game_message.emit(self.players[1].name + ' won $ ' + str(self.pot.value))
-
-        else:
-            for player in self.players:
-                player.receive_pot(self.pot.value/2)
-            self.game_message.emit('Draw! Pot splits between both players')
-
-        self.__new_round()
-        self.check_counter -= 1     # Drops the check counter after the winner is determined to prevent only one
-        # check being required to show the flop thereafter.
-
-    def loser(self):
-        for player in self.players:
-            if player.money.value <= 0:
-                self.game_message.emit(player.name + " is out of money, game ends!")
-                quit()
-
-    def change_active_player(self):
-        """
-        Method to change the player and show who's the active player, also saving the amount of money the active player
-        has, which is useful for setting a maximum bet in the view.
-        """
-
-        self.players[self.active_player].set_active(False)
-        self.active_player = (self.active_player + 1) % len(self.players)
-        self.players[self.active_player].set_active(True)
-
-        if self.active_player == 0:
-            self.the_active_player_name = str(self.players[0].name) + '\'s turn'
-            self.the_active_player_money = self.players[0].money.value
-            self.active_player_changed.emit()
-            self.players[1].hand.flip()
-            self.players[0].hand.flip()
-        else:
-            self.the_active_player_name = str(self.players[1].name) + '\'s turn'
-            self.the_active_player_money = self.players[1].money.value
-            self.active_player_changed.emit()
-            self.players[0].hand.flip()
-            self.players[1].hand.flip()
-
-    def blind(self, blind_player):
-        self.pot += 50
-        blind_player.place_bet(50)
-        self.blind_player_name = blind_player.name
+        self.send('fold')
 
+    def bet(self, amount):
+        self.send(f'bet {int(amount)}')
 
+    def allowed_bets(self):
+        max_bet = max(player.betted.value for player in self.players)
+        active = self.players[self.active_player]
+        return max_bet - active.betted.value, active.money.value
@@ -3,17 +3,26 @@ from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 from PyQt5.QtSvg import *
 from cardlib import *
+from cardassets import BACK, TABLE, CardAssets, card_name
+from collections import OrderedDict
+import math
 import sys
 
 import pokermodel
+import replay
+from history import read_hands
 from pokermodel import *
 
 
 class TableScene(QGraphicsScene):
     """ A scene with a table cloth background """
+    table_tile = None   # Loaded with the first scene and shared by all of them
+
     def __init__(self):
         super().__init__()
-        self.tile = QPixmap('cards/table.png')
+        if TableScene.table_tile is None:
+            TableScene.table_tile = QPixmap(TABLE)
+        self.tile = TableScene.table_tile
         self.setBackgroundBrush(QBrush(self.tile))
 
 
@@ -21,81 +30,228 @@ class CardItem(QGraphicsSvgItem):
     """ A simple overloaded QGraphicsSvgItem that also stores the card position """
     def __init__(self, renderer, position):
         super().__init__()
-        self.setSharedRenderer(renderer)
+        self.card_renderer = None
+        self.set_renderer(renderer)
         self.position = position
 
+    def set_renderer(self, renderer, scale=None):
+        """
+        Changes the image of the card, e.g. when it is flipped
+        :param renderer: SVG renderer of the new image
+        :param scale: Unused, the SVG is rendered at whatever scale the view has
+        """
+        if renderer is not self.card_renderer:
+            self.card_renderer = renderer
+            self.setSharedRenderer(renderer)
 
-def read_cards():
+
+class PixmapCardItem(QGraphicsPixmapItem):
+    """ A card drawn from a pre-rasterized pixmap with the shadow baked in, see CardPixmapCache """
+    def __init__(self, renderer, position, cache, scale):
+        super().__init__()
+        self.setTransformationMode(Qt.SmoothTransformation)
+        self.cache = cache
+        self.card_renderer = None
+        self.view_scale = None
+        self.set_renderer(renderer, scale)
+        self.position = position
+
+    def set_renderer(self, renderer, scale=None):
+        """
+        Changes the image of the card, or the scale of the view it is shown in
+        :param renderer: SVG renderer of the image
+        :param scale: Scale of the view, None to keep the current one
+        """
+        scale = self.view_scale if scale is None else scale
+        if renderer is self.card_renderer and scale == self.view_scale:
+            return
+        self.card_renderer, self.view_scale = renderer, scale
+        pixmap, margin, raster_scale = self.cache.get(renderer, scale)
+        self.setPixmap(pixmap)
+        self.setOffset(-margin, -margin)
+        self.setScale(1 / raster_scale)     # One pixel of the pixmap per pixel on the screen
+
+
+class CardPixmapCache:
+    """
+    Pixmaps of the cards rasterized at the scales they are shown at, shadow included, so that painting a card is a
+    plain blit. Scales are rounded to steps, so that resizing a window does not rasterize every card at every size
+    it passes, and the least recently used pixmaps are dropped beyond a maximum number.
+    """
+    def __init__(self, capacity=256, step=0.02):
+        """
+        :param capacity: Maximum number of pixmaps kept
+        :param step: Relative step the scales are rounded to
+        """
+        self.capacity = capacity
+        self.step = step
+        self.pixmaps = OrderedDict()
+
+    def get(self, renderer, scale):
+        """
+        :param renderer: SVG renderer of the card
+        :param scale: Scale of the view
+        :return: Tuple of (pixmap, margin of the shadow around the card in pixels, scale it was rasterized at)
+        """
+        scale = math.exp(round(math.log(max(scale, 0.01)) / self.step) * self.step)
+        key = (id(renderer), scale)
+        if key in self.pixmaps:
+            self.pixmaps.move_to_end(key)
+            return self.pixmaps[key]
+        pixmap, margin = rasterize(renderer, scale)
+        self.pixmaps[key] = pixmap, margin, scale
+        if len(self.pixmaps) > self.capacity:
+            self.pixmaps.popitem(last=False)
+        return self.pixmaps[key]
+
+
+def rasterize(renderer, scale, blur_radius=10., offset=5, color=QColor(0, 0, 0, 180)):
+    """
+    Renders a card with the same drop shadow the SVG items get from QGraphicsDropShadowEffect
+    :param renderer: SVG renderer of the card
+    :param scale: Size of the pixmap relative to the size of the SVG
+    :return: Tuple of (pixmap, margin of the shadow around the card in pixels)
+    """
+    size = renderer.defaultSize()
+    width, height = math.ceil(size.width() * scale), math.ceil(size.height() * scale)
+    card = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+    card.fill(Qt.transparent)
+    painter = QPainter(card)
+    renderer.render(painter, QRectF(0, 0, width, height))
+    painter.end()
+
+    # The shadow is drawn by the same effect, once, on a scene of its own
+    margin = math.ceil((blur_radius + offset) * scale)
+    scene = QGraphicsScene()
+    item = scene.addPixmap(QPixmap.fromImage(card))
+    shadow = QGraphicsDropShadowEffect()
+    shadow.setBlurRadius(blur_radius * scale)
+    shadow.setOffset(offset * scale, offset * scale)
+    shadow.setColor(color)
+    item.setGraphicsEffect(shadow)
+    image = QImage(width + 2 * margin, height + 2 * margin, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    scene.render(painter, QRectF(image.rect()), QRectF(-margin, -margin, image.width(), image.height()))
+    painter.end()
+    return QPixmap.fromImage(image), margin
+
+
+class CardRenderers(dict):
     """
-    Reads all the 52 cards from files.
-    :return: Dictionary of SVG renderers
+    SVG renderers of the cards by (value, suit) key, plus the back by the BACK key. A renderer is only created, and
+    its SVG parsed, the first time it is needed.
     """
-    all_cards = dict()  # Dictionaries let us have convenient mappings between cards and their images
-    for suit_file, suit in zip('HSCD', Suit):
-        for value_file, value in zip(['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A'], range(2, 15)):
-            file = value_file + suit_file
-            key = (value, suit)  # I'm choosing this tuple to be the key for this dictionary
-            all_cards[key] = QSvgRenderer('cards/' + file + '.svg')
-        #print(all_cards)
-    return all_cards
+    assets = CardAssets()
+
+    def __missing__(self, key):
+        name = key if key == BACK else card_name(*key)
+        renderer = self[key] = QSvgRenderer(QByteArray(self.assets.source(name)))
+        return renderer
 
 
 class CardView(QGraphicsView):
     """ A View widget that represents the table area displaying a players cards. """
 
-    # We read all the card graphics as static class variables
-    back_card = QSvgRenderer('cards/Red_Back_2.svg')
-    all_cards = read_cards()
+    # The card graphics are static class variables, read as the cards are first shown
+    all_cards = CardRenderers()
+
+    raster = False  #: Default rendering mode, see __init__
+    pixmap_cache = None     # Shared by the views in raster mode, created with the first one
 
-    def __init__(self, card_model: CardModel, card_spacing: int = 250, padding: int = 10):
+    def __init__(self, card_model: CardModel, card_spacing: int = 250, padding: int = 10, raster: bool = None):
         """
         Initializes the view to display the content of the given model
         :param cards_model: A model that represents a set of cards. Needs to support the CardModel interface.
         :param card_spacing: Spacing between the visualized cards.
         :param padding: Padding of table area around the visualized cards.
+        :param raster: Draw the cards from pixmaps rasterized once per scale instead of rendering the SVGs on every
+        paint. None for the class default.
         """
         self.scene = TableScene()
         super().__init__(self.scene)
 
         self.card_spacing = card_spacing
         self.padding = padding
+        self.raster = CardView.raster if raster is None else raster
+        self.view_scale = 1.
+        if self.raster and CardView.pixmap_cache is None:
+            CardView.pixmap_cache = CardPixmapCache()
 
         self.model = card_model
+        self.items = []     # Items of the cards in the scene, in the order of the model
+        self.pool = []      # Items of removed cards, kept to be reused
         # Whenever the this window should update, it should call the "__change_cards" method.
         # This view can do so by listening to the matching signal:
-        card_model.new_cards.connect(self.__change_cards)
+        card_model.new_cards.connect(self.__on_new_cards)
 
         # Add the cards the first time around to represent the initial state.
         self.__change_cards()
 
+    @property
+    def back_card(self):
+        return self.all_cards[BACK]
+
+    def __new_item(self, renderer, position):
+        if self.raster:
+            return PixmapCardItem(renderer, position, self.pixmap_cache, self.view_scale)
+        c = CardItem(renderer, position)
+
+        # Shadow effects are cool!
+        shadow = QGraphicsDropShadowEffect(c)
+        shadow.setBlurRadius(10.)
+        shadow.setOffset(5, 5)
+        shadow.setColor(QColor(0, 0, 0, 180))  # Semi-transparent black!
+        c.setGraphicsEffect(shadow)
+        return c
+
+    def __on_new_cards(self):
+        # Looks __change_cards up on every call rather than connecting it directly, so that views shown before the
+        # instrumentation is enabled (see instrumentation.enable) are timed too
+        self.__change_cards()
+
     def __change_cards(self):  # double underscore indicates that this is a private method
-        # Add the cards from scratch
-        self.scene.clear()
-        for i, card in enumerate(self.model):
+        # Reconcile the items in the scene with the model: cards that are still there only get a new image if it
+        # changed (e.g. on a flip), new cards reuse the items of removed ones, shadow and all, before creating any.
+        cards = list(self.model)
+        flipped = self.model.flipped()
+        resized = len(cards) != len(self.items)
+        for i, card in enumerate(cards):
             # The ID of the card in the dictionary of images is a tuple with (value, suit), both integers
-            graphics_key = (card.get_value(), card.suit)
-            renderer = self.back_card if self.model.flipped() else self.all_cards[graphics_key]
-            c = CardItem(renderer, i)
-
-            # Shadow effects are cool!
-            shadow = QGraphicsDropShadowEffect(c)
-            shadow.setBlurRadius(10.)
-            shadow.setOffset(5, 5)
-            shadow.setColor(QColor(0, 0, 0, 180))  # Semi-transparent black!
-            c.setGraphicsEffect(shadow)
+            renderer = self.back_card if flipped else self.all_cards[(card.get_value(), card.suit)]
+            if i < len(self.items):
+                self.items[i].set_renderer(renderer, self.view_scale)
+                continue
+            if self.pool:
+                c = self.pool.pop()
+                c.set_renderer(renderer, self.view_scale)
+                c.position = i
+            else:
+                c = self.__new_item(renderer, i)
 
             # Place the cards on the default positions
             c.setPos(c.position * self.card_spacing, 0)
             # We could also do cool things like marking card by making them transparent if we wanted to!
             # c.setOpacity(0.5 if self.model.marked(i) else 1.0)
             self.scene.addItem(c)
+            self.items.append(c)
 
-        self.update_view()
+        while len(self.items) > len(cards):
+            c = self.items.pop()
+            self.scene.removeItem(c)
+            self.pool.append(c)
+
+        if resized:
+            self.update_view()
 
     def update_view(self):
         scale = (self.viewport().height()-2*self.padding)/313
         self.resetTransform()
         self.scale(scale, scale)
+        if self.raster and scale > 0 and scale != self.view_scale:
+            self.view_scale = scale
+            for c in self.items:
+                c.set_renderer(c.card_renderer, scale)
         # Put the scene bounding box
         self.setSceneRect(-self.padding//scale, -self.padding//scale,
                           self.viewport().width()//scale, self.viewport().height()//scale)
@@ -233,14 +389,22 @@ class GraphicView(QGroupBox):
         vbox = QVBoxLayout()
         self.setLayout(vbox)
 
-        vbox.addWidget(PlayerView(game.players[0], game))
+        # The first half of the players sit above the table and the rest below it
+        half = (len(game.players) + 1) // 2
+        top, bottom = QHBoxLayout(), QHBoxLayout()
+        for i, player in enumerate(game.players):
+            (top if i < half else bottom).addWidget(PlayerView(player, game))
+        vbox.addLayout(top)
         vbox.addWidget(GameView(game))
-        vbox.addWidget(PlayerView(game.players[1], game))
+        vbox.addLayout(bottom)
 
 
 class MyWindow(QMainWindow):
     def __init__(self, game):
         super().__init__()
+        self.set_game(game)
+
+    def set_game(self, game):
         widget = QWidget()
         self.game = game
 
@@ -251,4 +415,45 @@ class MyWindow(QMainWindow):
         self.setCentralWidget(widget)
 
 
+class ReplayWindow(MyWindow):
+    """ Plays recorded rounds one action at a time, each round on a fresh ReplayModel """
+
+    def __init__(self, records, interval=1000):
+        self.records = iter(records)
+        super().__init__(ReplayModel(next(self.records)))
+        self.timer = QTimer()
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.step)
+        self.timer.start()
+
+    def step(self):
+        self.timer.stop()   # Messages of the game are modal, so no step may start while one is shown
+        try:
+            if not self.game.step():
+                self.game.verify()
+                record = next(self.records, None)
+                if record is None:
+                    self.statusBar().showMessage('End of the hand history')
+                    return
+                self.set_game(ReplayModel(record))
+        except replay.ReplayError as error:
+            GameView.game_alerts(str(error))
+            return
+        self.timer.start()
+
+
+def show_replay(path, interval=1000):
+    """
+    Shows the rounds of a hand history file in the game window
+
+    :param path: History file
+
+    :param interval: Milliseconds between actions
+    """
+    qt_app = QApplication(sys.argv)
+    win = ReplayWindow(read_hands(path), interval)
+    win.show()
+    qt_app.exec_()
+
+
 
@@ -0,0 +1,232 @@
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+from itertools import combinations, permutations
+import argparse
+import mmap
+import os
+import struct
+import sys
+from cardlib import *
+from equity import EquityCalculator
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'preflop_equity.bin')
+CLASSES = 169
+RANK_NAMES = '23456789TJQKA'
+
+# File layout: magic, format version and number of classes, followed by the CLASSES x CLASSES matrix of equities
+# as little-endian unsigned 16-bit integers (equity * 65535), row i being the equity of class i against class j.
+_MAGIC = b'PFEQ'
+_HEADER = struct.Struct('<4sHH')
+_SCALE = 65535
+
+
+def hand_class(cards):
+    """
+    Gives the starting hand class of two hole cards. Classes are laid out on a 13 x 13 grid: pairs on the diagonal,
+    suited hands at (high, low) and offsuit hands at (low, high), with ranks counted from the two.
+
+    :param cards: Two cards, e.g. player.hand.cards
+
+    :return: Class index 0-168
+    """
+    first, second = cards
+    high, low = sorted((first.get_value() - 2, second.get_value() - 2), reverse=True)
+    if first.suit == second.suit:
+        return high * 13 + low
+    return low * 13 + high
+
+
+def class_name(index):
+    """
+    Gives the usual short name of a starting hand class
+
+    :param index: Class index 0-168
+
+    :return: Name such as 'AA', 'AKs' or 'T9o'
+    """
+    row, column = divmod(index, 13)
+    if row == column:
+        return RANK_NAMES[row] * 2
+    if row > column:
+        return RANK_NAMES[row] + RANK_NAMES[column] + 's'
+    return RANK_NAMES[column] + RANK_NAMES[row] + 'o'
+
+
+def class_combos(index):
+    """
+    Gives every combination of hole cards in a starting hand class
+
+    :param index: Class index 0-168
+
+    :return: List of card set masks
+    """
+    row, column = divmod(index, 13)
+    if row == column:
+        cards = [1 << (suit * 13 + row) for suit in range(4)]
+        return [a | b for a, b in combinations(cards, 2)]
+    high, low = max(row, column), min(row, column)
+    if row > column:
+        return [1 << (suit * 13 + high) | 1 << (suit * 13 + low) for suit in range(4)]
+    return [1 << (a * 13 + high) | 1 << (b * 13 + low) for a in range(4) for b in range(4) if a != b]
+
+
+def _matchups(i, j):
+    """
+    Gives the distinct combo matchups of two classes up to suit relabelling
+
+    :return: Dictionary mapping (mask of class i combo, mask of class j combo) to its number of occurrences
+    """
+    matchups = {}
+    for a in class_combos(i):
+        for b in class_combos(j):
+            if a & b:
+                continue
+            key = min((permute_suits(a, p), permute_suits(b, p)) for p in permutations(range(4)))
+            matchups[key] = matchups.get(key, 0) + 1
+    return matchups
+
+
+def class_equity(i, j, iterations=None, seed=None):
+    """
+    Computes the all-in preflop equity of one starting hand class against another, averaged over every combination
+    of cards. This is the function executed in the worker processes of build_table.
+
+    :param i: Class index of the hero
+
+    :param j: Class index of the opponent
+
+    :param iterations: Rollouts per matchup, None for exact enumeration
+
+    :param seed: Seed for the rollouts
+
+    :return: Equity (wins plus half the ties) of class i
+    """
+    calculator = EquityCalculator(processes=0)
+    total = weight = 0
+    for (a, b), count in _matchups(i, j).items():
+        hand_a, hand_b = mask_to_cards(a), mask_to_cards(b)
+        if iterations is None:
+            result = calculator.exact(hand_a, hand_b)
+        else:
+            result = calculator.equity([hand_a, hand_b], iterations=iterations, seed=seed)
+        total += count * (result.wins[0] + result.ties[0] / 2) / result.rollouts
+        weight += count
+    return total / weight
+
+
+def build_table(path=DEFAULT_PATH, iterations=10000, processes=None, seed=0):
+    """
+    Computes the full matrix of class against class equities and writes it to disk. Only the upper triangle is
+    computed, since the equity of j against i is one minus the equity of i against j.
+
+    :param path: Output file
+
+    :param iterations: Rollouts per matchup, or None for exact enumeration, which takes days where the default
+                       takes well under an hour
+
+    :param processes: Number of worker processes, None for one per core
+    """
+    pairs = [(i, j) for i in range(CLASSES) for j in range(i, CLASSES)]
+    table = array('H', bytes(2 * CLASSES * CLASSES))
+    with ProcessPoolExecutor(processes) as pool:
+        results = pool.map(class_equity, *zip(*pairs), [iterations] * len(pairs), [seed] * len(pairs), chunksize=16)
+        for done, ((i, j), value) in enumerate(zip(pairs, results), 1):
+            table[i * CLASSES + j] = round(value * _SCALE)
+            table[j * CLASSES + i] = round((1 - value) * _SCALE)
+            if done % 500 == 0:
+                print(f"{done}/{len(pairs)} matchups", file=sys.stderr)
+    if sys.byteorder != 'little':
+        table.byteswap()
+    with open(path, 'wb') as file:
+        file.write(_HEADER.pack(_MAGIC, 1, CLASSES))
+        table.tofile(file)
+
+
+class PreflopTable:
+    """
+    Memory-mapped view of a table written by build_table. Opening it reads nothing but the header and every lookup
+    is a single array access.
+    """
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Maps the table file into memory
+
+        :param path: File written by build_table
+        """
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, classes = _HEADER.unpack_from(self.map)
+        if magic != _MAGIC or version != 1 or classes != CLASSES:
+            raise ValueError(f"{path} is not a preflop equity table")
+        if sys.byteorder == 'little':
+            self.view = memoryview(self.map)
+            self.values = self.view[_HEADER.size:].cast('H')
+        else:
+            self.view = None
+            self.values = array('H', self.map[_HEADER.size:])
+            self.values.byteswap()
+
+    @classmethod
+    def from_array(cls, values):
+        """
+        Uses a table that is already in memory instead of a file, e.g. a view of shared memory, see sharedtables
+
+        :param values: numpy uint16 array with the CLASSES x CLASSES entries of the table
+
+        :return: PreflopTable
+        """
+        table = cls.__new__(cls)
+        table.map = table.view = None
+        table.values = memoryview(values)
+        return table
+
+    def class_equity(self, i, j):
+        """
+        :param i: Class index of the hero
+
+        :param j: Class index of the opponent
+
+        :return: Equity of class i against class j
+        """
+        return self.values[i * CLASSES + j] / _SCALE
+
+    def equity(self, hand, other):
+        """
+        Looks up the preflop equity of two hands, e.g. table.equity(player.hand.cards, opponent.hand.cards). The
+        table holds class averages, so the exact suits of the two hands are not taken into account.
+
+        :param hand: Two hole cards of the hero
+
+        :param other: Two hole cards of the opponent
+
+        :return: Equity of the hero
+        """
+        return self.class_equity(hand_class(hand), hand_class(other))
+
+    def close(self):
+        """
+        Unmaps the file
+
+        """
+        if isinstance(self.values, memoryview):
+            self.values.release()
+        if self.view is not None:
+            self.view.release()
+        if self.map is not None:
+            self.map.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the preflop class against class equity table.')
+    parser.add_argument('--output', default=DEFAULT_PATH, help='table file to write')
+    parser.add_argument('--iterations', type=int, default=10000, help='rollouts per matchup, default 10000')
+    parser.add_argument('--exact', action='store_true',
+                        help='enumerate every board of every matchup instead of rollouts, takes days')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes, default one per core')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the rollouts')
+    args = parser.parse_args()
+    build_table(args.output, None if args.exact else args.iterations, args.processes, args.seed)
+
+
+if __name__ == '__main__':
+    main()
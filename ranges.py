@@ -0,0 +1,259 @@
+import argparse
+import random
+from itertools import combinations
+from math import comb
+import numpy as np
+from cardlib import *
+from equity import EquityResult
+from preflop import RANK_NAMES, class_combos
+
+# Suit letters of the usual card notation, e.g. 'Ah' for the ace of hearts
+SUIT_NAMES = {'h': Suit.Hearts, 's': Suit.Spades, 'c': Suit.Clubs, 'd': Suit.Diamonds}
+
+
+def parse_card(text):
+    """
+    Parses a card in the usual notation
+
+    :param text: Rank and suit, e.g. 'Ah' or 'Td'
+
+    :return: Card
+    """
+    if len(text) != 2 or text[0].upper() not in RANK_NAMES or text[1].lower() not in SUIT_NAMES:
+        raise ValueError(f"invalid card {text!r}")
+    return CARDS[SUIT_NAMES[text[1].lower()].value * 13 + RANK_NAMES.index(text[0].upper())]
+
+
+def parse_cards(text):
+    """
+    :param text: Cards written one after the other, e.g. 'AhKd2c'
+
+    :return: List of cards
+    """
+    return [parse_card(text[i:i + 2]) for i in range(0, len(text), 2)]
+
+
+def _class_index(high, low, suited):
+    # Same grid as preflop.hand_class: pairs on the diagonal, suited at (high, low) and offsuit at (low, high)
+    if high == low:
+        return high * 13 + high
+    return high * 13 + low if suited else low * 13 + high
+
+
+def _token_classes(token):
+    """
+    Expands one range token without weight into starting hand classes
+
+    :param token: e.g. 'TT', 'TT+', 'TT-77', 'AKs', 'AK', 'A2s+', 'KTo-K7o'
+
+    :return: List of class indices
+    """
+    first, _, last = token.partition('-')
+    plus = first.endswith('+')
+    first = first.rstrip('+')
+    if len(first) not in (2, 3) or any(rank not in RANK_NAMES for rank in first[:2]):
+        raise ValueError(f"invalid range token {token!r}")
+    high, low = RANK_NAMES.index(first[0]), RANK_NAMES.index(first[1])
+    kind = first[2:]
+    if high < low:
+        high, low = low, high
+    if kind not in ('', 's', 'o') or (high == low and kind):
+        raise ValueError(f"invalid range token {token!r}")
+    kinds = [True, False] if not kind else [kind == 's']
+
+    if last:
+        same = last[1:2] if high == low else first[:1]     # The pair or the high card stays the same
+        if last[:1] != same or last[2:] != kind or len(last) != len(first) or last[1] not in RANK_NAMES:
+            raise ValueError(f"invalid range token {token!r}")
+        end = RANK_NAMES.index(last[1])
+        lows = range(min(low, end), max(low, end) + 1)
+    elif plus:
+        lows = range(low, 13 if high == low else high)    # Pairs up to aces, other hands up to one below the high card
+    else:
+        lows = [low]
+    if high == low:
+        return [_class_index(rank, rank, False) for rank in lows]
+    return [_class_index(high, rank, suited) for rank in lows for suited in kinds]
+
+
+class Range:
+    """
+    A range of hole cards: every combination of two cards a player may hold, with a weight each
+    """
+    def __init__(self, combos=None):
+        """
+        :param combos: dict from card set mask of the two hole cards to weight
+        """
+        self.combos = dict(combos or {})
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Parses a range in the usual notation: comma separated pairs ('TT'), suited ('AKs'), offsuit ('KQo') or any
+        ('AK') hands, with '+' for every better kicker or pair ('A2s+', 'TT+'), '-' for a span ('KTo-K7o', 'TT-77')
+        and single combinations ('AhKh'). A token may end in a weight, e.g. 'AKo:0.5'; combinations given more than
+        once keep the last weight.
+
+        :param text: e.g. 'TT+, AKs, KQo'
+
+        :return: Range
+        """
+        combos = {}
+        for token in text.replace(' ', '').split(','):
+            if not token:
+                continue
+            token, _, weight = token.partition(':')
+            weight = float(weight) if weight else 1.0
+            if len(token) == 4 and token[1].lower() in SUIT_NAMES:
+                masks = [cards_to_mask(parse_cards(token))]
+                if bin(masks[0]).count('1') != 2:
+                    raise ValueError(f"invalid range token {token!r}")
+            else:
+                masks = [mask for index in _token_classes(token.upper()[:2] + token[2:]) for mask in class_combos(index)]
+            for mask in masks:
+                combos[mask] = weight
+        return cls(combos)
+
+    def without(self, dead):
+        """
+        Removes the combinations that hold any of the given cards, e.g. the board, and the ones with no weight
+
+        :param dead: Card set mask
+
+        :return: Range
+        """
+        return Range({mask: weight for mask, weight in self.combos.items() if not mask & dead and weight > 0})
+
+    def __len__(self):
+        return len(self.combos)
+
+    def __repr__(self):
+        return f"Range({len(self.combos)} combos)"
+
+
+_NEVER, _ALWAYS = -1, 1 << 14     # Below and above every hand rank once they are numbered in order
+
+
+def _combo_arrays(hand_range):
+    """
+    :return: Card set masks as uint64 array, card indices as (N, 2) array and weights as float array
+    """
+    masks = list(hand_range.combos)
+    indices = [[index for index in range(52) if mask >> index & 1] for mask in masks]
+    return (np.array(masks, dtype=np.uint64), np.array(indices, dtype=np.int32).reshape(-1, 2),
+            np.array([hand_range.combos[mask] for mask in masks], dtype=np.float64))
+
+
+def _runouts(free, missing, iterations, seed):
+    """
+    Gives the board completions: all of them when there are at most iterations, a uniform sample otherwise
+
+    :return: (N, missing) array of card indices
+    """
+    if comb(len(free), missing) <= iterations:
+        runouts = list(combinations(free, missing))
+    else:
+        rng = random.Random(seed)
+        runouts = [rng.sample(free, missing) for _ in range(iterations)]
+    return np.array(runouts, dtype=np.int32).reshape(len(runouts), missing)
+
+
+def _ranks(board, runouts, holes):
+    """
+    Evaluates every combination on every runout
+
+    :return: (runouts, combinations) array of hand ranks
+    """
+    count, size = len(runouts), len(holes)
+    cards = np.concatenate([np.broadcast_to(board, (count, size, len(board))),
+                            np.broadcast_to(runouts[:, None, :], (count, size, runouts.shape[1])),
+                            np.broadcast_to(holes[None, :, :], (count, size, 2))], axis=2)
+    return evaluate_batch(cards.reshape(-1, 7)).reshape(count, size)
+
+
+def range_equity(hero, villain, board=(), iterations=20000, seed=None, chunk=4000000):
+    """
+    Computes the showdown equity of one range against another. Combinations that share a card with the board or with
+    each other are left out, and every matchup of a hero and a villain combination counts with the product of their
+    weights, over the runouts that do not hold either one's cards. All the combinations are evaluated on all the
+    runouts with evaluate_batch, and the matchups are compared as whole arrays, so a flop query with its 1,081 turn
+    and river cards takes a fraction of a second for ranges of a few hundred combinations.
+
+    :param hero: Range, or its text, e.g. 'TT+, AKs, KQo'
+
+    :param villain: Range, or its text
+
+    :param board: Cards already on the table, e.g. game.table.cards
+
+    :param iterations: Runouts enumerated exactly up to this number (any flop, turn or river), sampled otherwise
+
+    :param seed: Seed of the sampled runouts
+
+    :param chunk: Matchups times runouts compared at once, bounds the memory used
+
+    :return: EquityResult of hero and villain, the counts being weighted fractions of the matchups
+    """
+    hero = Range.parse(hero) if isinstance(hero, str) else hero
+    villain = Range.parse(villain) if isinstance(villain, str) else villain
+    board_mask = cards_to_mask(board)
+    hero, villain = hero.without(board_mask), villain.without(board_mask)
+    if not hero or not villain:
+        raise ValueError("a range has no combinations left besides the board")
+    hero_masks, hero_holes, hero_weights = _combo_arrays(hero)
+    villain_masks, villain_holes, villain_weights = _combo_arrays(villain)
+    board_cards = np.array([card.index for card in board], dtype=np.int32)
+    runouts = _runouts([index for index in range(52) if not board_mask >> index & 1], 5 - len(board_cards),
+                       iterations, seed)
+    runout_masks = np.bitwise_or.reduce(np.left_shift(np.uint64(1), runouts.astype(np.uint64)), axis=1) \
+        if runouts.shape[1] else np.zeros(len(runouts), dtype=np.uint64)
+
+    # Runouts holding a card of a combination can not happen with it. Such ranks are replaced by values that never
+    # win, so that a matchup only counts on the runouts valid for both combinations without masking every comparison.
+    wins = np.zeros((len(hero), len(villain)), dtype=np.int64)
+    losses = np.zeros_like(wins)
+    counts = np.zeros_like(wins)
+    step = max(1, chunk // (len(hero) * len(villain)))
+    for start in range(0, len(runouts), step):
+        part, masks = runouts[start:start + step], runout_masks[start:start + step, None]
+        ranks = np.concatenate([_ranks(board_cards, part, hero_holes), _ranks(board_cards, part, villain_holes)],
+                               axis=1)
+        # Only the order of the ranks matters, and there are fewer than 7,462 different ones: as small integers they
+        # compare faster
+        ranks = np.unique(ranks, return_inverse=True)[1].reshape(ranks.shape).astype(np.int16)
+        hero_ranks, villain_ranks = ranks[:, :len(hero)], ranks[:, len(hero):]
+        hero_valid, villain_valid = (masks & hero_masks) == 0, (masks & villain_masks) == 0
+        wins += np.add.reduce(np.where(hero_valid, hero_ranks, _NEVER)[:, :, None] >
+                              np.where(villain_valid, villain_ranks, _ALWAYS)[:, None, :], axis=0, dtype=np.int32)
+        losses += np.add.reduce(np.where(villain_valid, villain_ranks, _NEVER)[:, None, :] >
+                                np.where(hero_valid, hero_ranks, _ALWAYS)[:, :, None], axis=0, dtype=np.int32)
+        counts += hero_valid.T.astype(np.int64) @ villain_valid.astype(np.int64)
+    ties = counts - wins - losses
+
+    weights = np.outer(hero_weights, villain_weights)
+    weights[(hero_masks[:, None] & villain_masks[None, :]) != 0] = 0    # Both can not hold the same card
+    weights[counts == 0] = 0
+    if not weights.any():
+        raise ValueError("the ranges have no matchup without shared cards")
+    shares = weights / np.maximum(counts, 1)
+    win, tie = float((shares * wins).sum()), float((shares * ties).sum())
+    total = float(weights.sum())
+    lose = total - win - tie
+    return EquityResult([win, lose], [tie, tie], [lose, win], total)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute the equity of a range against another.')
+    parser.add_argument('hero', help='range of the hero, e.g. "TT+, AKs, KQo"')
+    parser.add_argument('villain', help='range of the villain')
+    parser.add_argument('--board', default='', help='cards on the table, e.g. AhKd2c')
+    parser.add_argument('--iterations', type=int, default=20000, help='runouts sampled when there are more')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    result = range_equity(args.hero, args.villain, parse_cards(args.board), args.iterations, args.seed)
+    for name, player in (('hero', 0), ('villain', 1)):
+        print(f"{name}: equity {result.win(player) + result.tie(player) / 2:.4f} "
+              f"(win {result.win(player):.4f}, tie {result.tie(player):.4f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+from multiprocessing import Pool
+import argparse
+import struct
+import sys
+from history import HandRecord, read_records
+from pokerengine import Player, TexasHoldEm
+
+
+class ReplayError(Exception):
+    """
+    Raised when a recorded round does not play out the same way again
+    """
+
+
+class ReplayGame(TexasHoldEm):
+    """
+    A game that deals exactly one recorded round: the players start with the recorded stacks, the deck is shuffled
+    with the recorded seed and the game is over as soon as the pot of that round is paid out. The recorded actions
+    are applied one at a time with step(), and every one is checked against what the engine does with it.
+    """
+    def __init__(self, record, players=None, listeners=(), **kwargs):
+        """
+        Sets up the game and deals the recorded round
+
+        :param record: HandRecord
+
+        :param players: List of Player, by default new players named after their seat
+
+        :param listeners: GameListeners to notify
+        """
+        if players is None:
+            players = [Player(f'Player {seat + 1}') for seat in range(len(record.stacks))]
+        if len(players) != len(record.stacks):
+            raise ReplayError(f"record has {len(record.stacks)} players, got {len(players)}")
+        for player, stack in zip(players, record.stacks):
+            player.money.value = stack
+            player.money.changed()
+        self.record = record
+        self.position = 0       # Index of the next recorded action
+        self.played = []        # Actions as the engine reported them
+        self.finished = False
+        super().__init__(players, listeners=listeners, active_player=(record.blind - 1) % len(players), **kwargs)
+
+        if self.blind_index != record.blind:
+            raise ReplayError(f"blind paid by player {self.blind_index}, recorded {record.blind}")
+        hole_cards = [[card.index for card in player.hand.cards] for player in players]
+        if hole_cards != record.hole_cards:
+            raise ReplayError(f"hole cards {hole_cards} differ from the recorded {record.hole_cards}")
+
+    def next_round_seed(self):
+        return self.record.seed
+
+    def action(self, action, amount):
+        self.played.append((self.active_player, action, amount))
+        super().action(action, amount)
+
+    def end_round(self):
+        self.finished = True
+        self.board = [card.index for card in self.table.cards]
+        self.final_stacks = [player.money.value for player in self.players]
+        self.ranks = [None if player.folded else player.hand_rank() for player in self.players]
+        super().end_round()
+
+    def loser(self):
+        if self.finished:   # Only the recorded round is played
+            self.game_over = True
+            return True
+        return super().loser()
+
+    def step(self):
+        """
+        Applies the next recorded action
+
+        :return: False when all the actions have been applied
+        """
+        if self.position == len(self.record.actions):
+            return False
+        if self.finished:
+            raise ReplayError(f"round ended after {self.position} of {len(self.record.actions)} actions")
+        player, action, amount = self.record.actions[self.position]
+        if player != self.active_player:
+            raise ReplayError(f"action {self.position} recorded for player {player}, "
+                              f"but it is player {self.active_player}'s turn")
+        if action == 'bet':
+            accepted = self.bet(amount)
+        else:
+            accepted = getattr(self, action)()
+        if not accepted:
+            raise ReplayError(f"action {self.position} ({action} {amount}) was refused")
+        if self.played[-1] != (player, action, amount):
+            raise ReplayError(f"action {self.position} played as {self.played[-1]}, "
+                              f"recorded {(player, action, amount)}")
+        self.position += 1
+        return True
+
+    def winners(self):
+        """
+        The players with the best hand at the showdown, who take the main pot
+
+        :return: List of player indices, empty if the round ended with all but one player folded
+        """
+        ranks = [rank for rank in self.ranks if rank is not None]
+        if len(ranks) < 2:
+            return []
+        best = max(ranks)
+        return [seat for seat, rank in enumerate(self.ranks) if rank == best]
+
+    def verify(self):
+        """
+        Checks the end of the round against the record, once all the actions have been applied
+
+        """
+        record = self.record
+        if not self.finished:
+            raise ReplayError(f"round did not end after the {len(record.actions)} recorded actions")
+        if self.played != record.actions:
+            raise ReplayError(f"played {self.played}, recorded {record.actions}")
+        if self.board != record.board:
+            raise ReplayError(f"board {self.board} differs from the recorded {record.board}")
+        if self.final_stacks != record.final_stacks:
+            raise ReplayError(f"stacks {self.final_stacks} differ from the recorded {record.final_stacks}")
+        if sum(record.final_stacks) != sum(record.stacks):
+            raise ReplayError(f"{sum(record.stacks)} chips before the round, {sum(record.final_stacks)} after")
+
+        # The best hand wins every pot it was in for, so it can not lose chips. Side pots may pay other players too.
+        lost = [seat for seat in self.winners() if record.final_stacks[seat] < record.stacks[seat]]
+        if lost:
+            raise ReplayError(f"showdown won by {self.winners()}, but {lost} lost chips")
+
+
+def replay(record):
+    """
+    Plays a recorded round again and checks that it ends the same way
+
+    :param record: HandRecord
+
+    :return: The finished ReplayGame
+    """
+    game = ReplayGame(record)
+    while game.step():
+        pass
+    game.verify()
+    return game
+
+
+def _replay_bodies(bodies):
+    """
+    Replays a chunk of encoded records. This is the function executed in the worker processes. A record that can not
+    be decoded fails on its own, without stopping the others.
+
+    :return: Tuple of (number of records, list of (index, error message) of the failed ones)
+    """
+    failures = []
+    for index, body in bodies:
+        try:
+            record = HandRecord.decode(body)
+        except (struct.error, IndexError, KeyError, ValueError) as error:
+            failures.append((index, f"corrupt record: {error}"))
+            continue
+        try:
+            replay(record)
+        except ReplayError as error:
+            failures.append((index, str(error)))
+    return len(bodies), failures
+
+
+def replay_file(path, processes=None, chunk=1000):
+    """
+    Replays every record of a history file on a pool of worker processes. The records are sent to the workers still
+    encoded, so they are only decoded once, where they are replayed.
+
+    :param path: History file
+
+    :param processes: Number of worker processes, None for one per core
+
+    :param chunk: Records per task sent to a worker
+
+    :return: Tuple of (number of records, sorted list of (record index, error message) of the failed ones)
+    """
+    def chunks():
+        bodies = []
+        for body in enumerate(read_records(path)):
+            bodies.append(body)
+            if len(bodies) == chunk:
+                yield bodies
+                bodies = []
+        if bodies:
+            yield bodies
+
+    total, failures = 0, []
+    with Pool(processes) as pool:
+        for count, failed in pool.imap_unordered(_replay_bodies, chunks()):
+            total += count
+            failures.extend(failed)
+    return total, sorted(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay and verify the rounds of a hand history file.')
+    parser.add_argument('history', help='hand history file, see pokergame.py --history')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes, default one per core')
+    parser.add_argument('--window', action='store_true', help='show the rounds step by step in the game window')
+    parser.add_argument('--interval', type=int, default=1000, help='milliseconds between actions with --window')
+    args = parser.parse_args()
+
+    if args.window:
+        from pokerview import show_replay
+        show_replay(args.history, args.interval)
+        return
+
+    total, failures = replay_file(args.history, args.processes)
+    for index, error in failures:
+        print(f"record {index}: {error}", file=sys.stderr)
+    print(f"{total} rounds replayed, {len(failures)} failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,402 @@
+import argparse
+import asyncio
+import itertools
+import json
+import instrumentation
+from pokerengine import GameListener, Player, TexasHoldEm
+
+# The protocol is line based: every line is one UTF-8 message.
+#
+# Client to server, plain text commands:
+#   join <name>         take a seat at the next table with a free seat, the game starts when the table is full
+#   check | call | fold
+#   bet <amount>
+#   quit
+#
+# Server to client, one JSON object per line with an "event" field:
+#   seated      {"table": id, "seat": index}
+#   start       {"names": [...]}, the table is full and the first round is dealt
+#   state       {"active", "blind", "pot", "board", "players": [{"name", "money", "betted", "cards"}]}, where cards
+#               are compact card indices (see cardlib.CARDS) and null for the hands of the other players
+#   message     {"text"}, messages of the game
+#   refused     {"text"}, the game did not allow the last action, only sent to the player that tried it
+#   round_end   {"board", "hands", "stacks"}, hands are only shown when the round ended in a showdown, and then
+#               null for the players that folded
+#   error       {"text"}, for commands the server did not accept
+#   game_over   {"text"}
+#
+# Every table is one asyncio task that owns its game, so there are no threads and no locks. Commands reach it through
+# a bounded queue: when a table falls behind, the connections of its players stop being read, which in turn stops
+# the clients through TCP flow control. Outgoing lines go through a bounded queue per client, and a client that does
+# not read fast enough to keep it from filling up is disconnected rather than slowing down its table.
+
+ACTIONS = ('check', 'call', 'fold', 'bet')
+
+
+class Client:
+    """
+    One connection, with a writer task that drains its outgoing queue
+    """
+    def __init__(self, reader, writer, queue_size=256):
+        """
+        :param reader: asyncio.StreamReader
+
+        :param writer: asyncio.StreamWriter
+
+        :param queue_size: Maximum number of lines waiting to be sent before the client counts as too slow
+        """
+        self.reader = reader
+        self.writer = writer
+        self.outgoing = asyncio.Queue(queue_size)
+        self.table = None
+        self.seat = None
+        self.closed = False
+        self.sender = asyncio.get_running_loop().create_task(self.__send_loop())
+
+    async def __send_loop(self):
+        try:
+            while True:
+                lines = [await self.outgoing.get()]
+                while not self.outgoing.empty():     # Whatever queued up meanwhile goes out in one write
+                    lines.append(self.outgoing.get_nowait())
+                if None in lines:
+                    self.writer.write(b''.join(lines[:lines.index(None)]))
+                    await self.writer.drain()
+                    break
+                self.writer.write(b''.join(lines))
+                await self.writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.closed = True
+            self.writer.close()
+
+    def send(self, event, **fields):
+        """
+        Queues a message, disconnecting the client if its queue is full
+
+        :param event: Event name
+
+        :param fields: Fields of the message
+        """
+        if self.closed:
+            return
+        try:
+            self.outgoing.put_nowait((json.dumps({'event': event, **fields}, separators=(',', ':')) + '\n').encode())
+        except asyncio.QueueFull:
+            self.closed = True
+            self.sender.cancel()
+            self.writer.transport.abort()
+
+    def close(self):
+        """
+        Sends the queued messages and closes the connection
+
+        """
+        if not self.closed:
+            self.closed = True
+            if self.outgoing.full():
+                self.sender.cancel()
+            else:
+                self.outgoing.put_nowait(None)
+
+
+class Table(GameListener):
+    """
+    A table of the server: the seated clients, their game and the task that plays it
+    """
+    def __init__(self, table_id, seats=2, queue_size=64, seed=None):
+        """
+        :param table_id: Number of the table
+
+        :param seats: Players needed to start the game
+
+        :param queue_size: Maximum number of commands waiting for the table before its clients stop being read
+
+        :param seed: Seed of the game
+        """
+        self.id = table_id
+        self.seats = seats
+        self.seed = seed
+        self.clients = []
+        self.game = None
+        self.inbox = asyncio.Queue(queue_size)
+        self.messages = []      # Messages of the command being played
+        self.task = None
+
+    def full(self):
+        return len(self.clients) == self.seats
+
+    def seat(self, client, name):
+        """
+        Seats a client, starting the game when the table is full
+
+        :param client: Client
+
+        :param name: Name of the player
+        """
+        client.table, client.seat = self, len(self.clients)
+        self.clients.append((client, name))
+        client.send('seated', table=self.id, seat=client.seat)
+        if self.full():
+            names = [name for _, name in self.clients]
+            for other, _ in self.clients:
+                other.send('start', names=names)
+            self.game = TexasHoldEm([Player(name) for name in names], listeners=[self], seed=self.seed)
+            self.flush()
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self):
+        """
+        Plays the commands of the clients until the game is over or a player leaves
+
+        """
+        try:
+            while not self.game.game_over:
+                seat, command, argument = await self.inbox.get()
+                if command == 'quit':
+                    name = self.clients[seat][1]
+                    self.broadcast('game_over', text=f'{name} left the table')
+                    break
+                self.play(seat, command, argument)
+                await asyncio.sleep(0)  # Lets the other tables run, even if this one has more commands waiting
+        finally:
+            for client, _ in self.clients:
+                client.close()
+
+    def play(self, seat, command, argument):
+        """
+        Plays one command of a client
+
+        :param seat: Seat of the client
+
+        :param command: One of ACTIONS
+
+        :param argument: Amount to bet
+        """
+        client = self.clients[seat][0]
+        if seat != self.game.active_player:
+            client.send('error', text='Not your turn')
+            return
+        if command == 'bet':
+            accepted = self.game.bet(argument)
+        else:
+            accepted = getattr(self.game, command)()
+        if accepted:
+            self.flush()
+        else:
+            for text in self.messages:
+                client.send('refused', text=text)
+            self.messages = []
+
+    def flush(self):
+        """
+        Sends the messages of the last command and the new state of the game to every client
+
+        """
+        for text in self.messages:
+            self.broadcast('message', text=text)
+        self.messages = []
+        if not self.game.game_over:
+            for client, _ in self.clients:
+                client.send('state', **self.state(client.seat))
+
+    def state(self, seat):
+        """
+        The state of the game as seen from a seat
+
+        :param seat:
+
+        :return: dict with the fields of the state message, the cards of the other seats are None unless they have
+            none
+        """
+        game = self.game
+        return {'active': game.active_player, 'blind': game.blind_index, 'pot': game.pot.value,
+                'board': [card.index for card in game.table.cards],
+                'players': [{'name': player.name, 'money': player.money.value, 'betted': player.betted.value,
+                             'folded': player.folded,
+                             'cards': [card.index for card in player.hand.cards]
+                             if index == seat or not player.hand.cards else None}
+                            for index, player in enumerate(game.players)]}
+
+    def broadcast(self, event, **fields):
+        for client, _ in self.clients:
+            client.send(event, **fields)
+
+    def on_message(self, game, text):
+        self.messages.append(text)
+
+    def on_round_end(self, game):
+        for text in self.messages:   # The winner message belongs before the end of the round
+            self.broadcast('message', text=text)
+        self.messages = []
+        showdown = sum(not player.folded for player in game.players) > 1
+        self.broadcast('round_end', board=[card.index for card in game.table.cards],
+                       hands=[None if player.folded else [card.index for card in player.hand.cards]
+                              for player in game.players] if showdown else None,
+                       stacks=[player.money.value for player in game.players])
+
+    def on_game_over(self, game, player):
+        for text in self.messages:
+            self.broadcast('message', text=text)
+        self.messages = []
+        self.broadcast('game_over', text=f'{player.name} is out of money')
+
+
+class GameServer:
+    """
+    Hosts any number of tables in one event loop. Clients are seated in the order they join, filling one table at a
+    time.
+    """
+    def __init__(self, seats=2, queue_size=64, client_queue_size=256, seed=None):
+        """
+        :param seats: Players per table
+
+        :param queue_size: Commands waiting per table, see Table
+
+        :param client_queue_size: Lines waiting per client, see Client
+
+        :param seed: Seed of the games, every table gets its own seed derived from it. None for random games.
+        """
+        self.seats = seats
+        self.queue_size = queue_size
+        self.client_queue_size = client_queue_size
+        self.seed = seed
+        self.ids = itertools.count()
+        self.tables = {}
+        self.open_table = None
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=0):
+        """
+        Starts listening
+
+        :param host:
+
+        :param port: TCP port, 0 for any free port
+
+        :return: The port the server listens on
+        """
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """
+        Stops listening and ends every table
+
+        """
+        self.server.close()
+        await self.server.wait_closed()
+        for table in list(self.tables.values()):
+            if table.task:
+                table.task.cancel()
+
+    def seat(self, client, name):
+        """
+        Seats a client at the open table, opening a new one if needed
+
+        :param client: Client
+
+        :param name: Name of the player
+        """
+        if self.open_table is None:
+            table_id = next(self.ids)
+            seed = None if self.seed is None else self.seed * 2 ** 32 + table_id
+            self.open_table = self.tables[table_id] = Table(table_id, self.seats, self.queue_size, seed)
+        table = self.open_table
+        table.seat(client, name)
+        if table.full():
+            self.open_table = None
+            table.task.add_done_callback(lambda task: self.tables.pop(table.id, None))
+
+    def leave(self, client):
+        """
+        Takes a disconnected client off its table
+
+        :param client: Client
+        """
+        table = client.table
+        if table is None:
+            return
+        if table.task is None:  # Still waiting for players, the seat is freed
+            table.clients = [(other, name) for other, name in table.clients if other is not client]
+            for seat, (other, _) in enumerate(table.clients):
+                other.seat = seat
+            if not table.clients:
+                self.tables.pop(table.id, None)
+                self.open_table = None
+        elif not table.task.done():
+            try:
+                table.inbox.put_nowait((client.seat, 'quit', None))
+            except asyncio.QueueFull:
+                table.task.cancel()
+
+    async def handle_client(self, reader, writer):
+        client = Client(reader, writer, self.client_queue_size)
+        try:
+            while not client.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                command, _, argument = line.decode(errors='replace').strip().partition(' ')
+                command = command.lower()
+                if command == 'join':
+                    if client.table is not None:
+                        client.send('error', text='Already seated')
+                    else:
+                        self.seat(client, argument.strip() or 'Player')
+                elif command == 'quit':
+                    break
+                elif command in ACTIONS:
+                    if client.table is None or client.table.game is None:
+                        client.send('error', text='The game has not started')
+                        continue
+                    amount = None
+                    if command == 'bet':
+                        try:
+                            amount = int(argument)
+                        except ValueError:
+                            client.send('error', text='bet needs an integer amount')
+                            continue
+                    await client.table.inbox.put((client.seat, command, amount))     # Waits when the table is behind
+                else:
+                    client.send('error', text=f'Unknown command {command!r}')
+        except ConnectionError:
+            pass
+        finally:
+            self.leave(client)
+            client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Texas Hold'em server hosting many tables.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--seed', type=int, default=None, help='seed of the games, default random')
+    parser.add_argument('--seats', type=int, default=2, help='players per table')
+    parser.add_argument('--queue-size', type=int, default=64, help='commands waiting per table')
+    parser.add_argument('--client-queue-size', type=int, default=256,
+                        help='lines waiting per client before it is disconnected as too slow')
+    parser.add_argument('--profile', type=float, metavar='SECONDS',
+                        help='time the game operations and report them to stderr every SECONDS; '
+                             'SIGUSR1 turns this on and off while serving')
+    args = parser.parse_args()
+    instrumentation.install_signal_handler()
+    if args.profile:
+        instrumentation.enable()
+        instrumentation.start_dump(args.profile)
+
+    async def serve():
+        server = GameServer(args.seats, queue_size=args.queue_size, client_queue_size=args.client_queue_size, seed=args.seed)
+        port = await server.start(args.host, args.port)
+        print(f'Listening on {args.host}:{port}')
+        await server.server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
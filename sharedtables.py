@@ -0,0 +1,145 @@
+from multiprocessing import shared_memory
+import numpy as np
+import cardlib
+
+# Lookup tables are published once by the parent process, each as a block of shared memory, and the worker processes
+# attach numpy views of the same blocks. The workers only receive the names, types and shapes of the blocks (see
+# SharedTables.spec), so no table is pickled or copied and every worker uses the same physical memory.
+
+_attached = None    # SharedTables of this worker process, kept alive for as long as the process uses its views
+
+
+class SharedTables:
+    """
+    Named numpy arrays in shared memory. The process that publishes them owns the memory and frees it on close.
+    """
+    def __init__(self):
+        self.blocks = {}    # Name: SharedMemory
+        self.arrays = {}    # Name: numpy view of the block
+        self.owner = True
+
+    def publish(self, name, values):
+        """
+        Copies an array into a new block of shared memory
+
+        :param name: Name of the table, e.g. 'hand_table'
+
+        :param values: numpy array, or anything numpy.asarray takes
+
+        :return: The shared copy as a numpy array
+        """
+        values = np.ascontiguousarray(values)
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        shared = np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)
+        shared[...] = values
+        self.blocks[name] = block
+        self.arrays[name] = shared
+        return shared
+
+    def spec(self):
+        """
+        :return: Picklable description of the tables for attach, dict from name to (block name, dtype, shape)
+        """
+        return {name: (self.blocks[name].name, array.dtype.str, array.shape) for name, array in self.arrays.items()}
+
+    @classmethod
+    def attach(cls, spec):
+        """
+        Maps the tables published by another process
+
+        :param spec: Result of spec() in the publishing process
+
+        :return: SharedTables with read-only views, which does not free the memory on close
+        """
+        tables = cls()
+        tables.owner = False
+        for name, (block_name, dtype, shape) in spec.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            array.flags.writeable = False
+            tables.blocks[name] = block
+            tables.arrays[name] = array
+        return tables
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __contains__(self, name):
+        return name in self.arrays
+
+    def close(self):
+        """
+        Drops the views and unmaps the memory, and frees it if this process published it. Views taken from the
+        tables must not be used afterwards.
+
+        """
+        self.arrays = {}
+        for block in self.blocks.values():
+            block.close()
+            if self.owner:
+                block.unlink()
+        self.blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def publish_tables(hand_table=None, preflop_table=None):
+    """
+    Publishes the lookup tables of the evaluators and of the equity, for the workers of a pool to use with install
+
+    :param hand_table: Optional handtable.HandTable
+
+    :param preflop_table: Optional preflop.PreflopTable
+
+    :return: SharedTables, to be closed once the workers are done
+    """
+    tables = SharedTables()
+    popcount, highest, straight, top = cardlib.numpy_tables()
+    tables.publish('popcount', popcount)
+    tables.publish('highest', highest)
+    tables.publish('straight', straight)
+    for count, values in enumerate(top):
+        tables.publish(f'top{count}', values)
+    if hand_table is not None:
+        tables.publish('hand_table', hand_table.values)
+    if preflop_table is not None:
+        tables.publish('preflop', preflop_table.values)
+    return tables
+
+
+def install(tables):
+    """
+    Makes this process evaluate with shared tables: evaluate_batch with the published lookup arrays and, if it was
+    published, evaluate_mask and evaluate_batch with the hand table. The preflop table is used through
+    preflop.PreflopTable.from_array(tables['preflop']).
+
+    :param tables: SharedTables
+    """
+    top = [tables[f'top{count}'] for count in range(sum(name.startswith('top') for name in tables.arrays))]
+    cardlib.set_numpy_tables((tables['popcount'], tables['highest'], tables['straight'], top))
+    if 'hand_table' in tables:
+        import handtable
+        cardlib.set_evaluator(handtable.HandTable.from_array(tables['hand_table']))
+
+
+def attach_worker(spec):
+    """
+    Initializer for the workers of a process pool: attaches the tables published by the parent and installs them,
+    e.g. ProcessPoolExecutor(initializer=attach_worker, initargs=(tables.spec(),))
+
+    :param spec: SharedTables.spec() of the parent
+    """
+    global _attached
+    _attached = SharedTables.attach(spec)
+    install(_attached)
+
+
+def worker_tables():
+    """
+    :return: SharedTables attached by attach_worker in this process, None in other processes
+    """
+    return _attached
@@ -0,0 +1,275 @@
+from multiprocessing import Pool
+import argparse
+import importlib
+import math
+import random
+import sys
+from cardlib import *
+from pokerengine import GameListener, Player, TexasHoldEm
+
+
+# A strategy is a function strategy(game, rng) returning the action of the active player as (action, amount), where
+# action is 'check', 'bet', 'call' or 'fold' and amount is only used for bets. Refused actions fall back to check,
+# call and finally fold, so a strategy only has to say what it would like to do.
+
+def passive(game, rng):
+    """
+    Never bets, checks when possible and calls otherwise
+    """
+    return 'check', 0
+
+
+def aggressive(game, rng):
+    """
+    Raises by the blind whenever it can
+    """
+    minimum, money = game.allowed_bets()
+    return 'bet', min(minimum + 50, money)
+
+
+def random_player(game, rng):
+    """
+    Picks any action at random
+    """
+    minimum, money = game.allowed_bets()
+    return rng.choice(['check', 'bet', 'call', 'fold']), min(minimum + rng.choice([50, 100, 200]), money)
+
+
+def hand_strength(game, rng):
+    """
+    Bets with a pair or better, otherwise checks and calls until the river, where it folds to a bet
+    """
+    player = game.players[game.active_player]
+    minimum, money = game.allowed_bets()
+    hand_type = player.hand.best_poker_hand(game.table.cards).type
+    if hand_type.value >= HandType.PAIR.value:
+        return 'bet', min(minimum + 100, money)
+    if minimum > 0 and len(game.table.cards) == 5:
+        return 'fold', 0
+    return 'check', 0
+
+
+STRATEGIES = {'passive': passive, 'aggressive': aggressive, 'random': random_player, 'strength': hand_strength}
+
+
+def load_strategy(name):
+    """
+    Finds a strategy by name
+
+    :param name: Name of a built-in strategy, or 'module:function'
+
+    :return: Strategy function
+    """
+    if name in STRATEGIES:
+        return STRATEGIES[name]
+    module, _, function = name.partition(':')
+    return getattr(importlib.import_module(module), function)
+
+
+class RoundCounter(GameListener):
+    def __init__(self):
+        self.rounds = 0
+        self.stacks = None     # Money of the players once the pot of the last finished round was paid out
+
+    def on_round_end(self, game):
+        self.rounds += 1
+        self.stacks = [player.money.value for player in game.players]
+
+
+def play_action(game, action, amount):
+    """
+    Plays an action on the game, falling back to check, call and fold if it is refused
+
+    :param game: TexasHoldEm
+
+    :param action: 'check', 'bet', 'call' or 'fold'
+
+    :param amount: Amount to bet
+    """
+    if action == 'bet':
+        if game.bet(amount):
+            return
+    elif action == 'fold':
+        game.fold()
+        return
+    elif action == 'call':
+        if game.call():
+            return
+    if not game.check() and not game.call():
+        game.fold()
+
+
+def play_match(strategy_a, strategy_b, seed, max_rounds=1000):
+    """
+    Plays one heads-up match until a player is out of money or the round limit is reached
+
+    :param strategy_a: Strategy name of the first player
+
+    :param strategy_b: Strategy name of the second player
+
+    :param seed: Seed of the match, which decides both the cards and the strategies' random choices
+
+    :param max_rounds: Round limit
+
+    :return: Tuple of (rounds played, chips won by the first player, 1/0/-1 if the first player won/drew/lost)
+    """
+    rng = random.Random(seed)
+    strategies = [load_strategy(strategy_a), load_strategy(strategy_b)]
+    players = [Player('A'), Player('B')]
+    counter = RoundCounter()
+    game = TexasHoldEm(players, listeners=[counter], seed=rng.getrandbits(64))
+    start = players[0].money.value
+    while not game.game_over and counter.rounds < max_rounds:
+        play_action(game, *strategies[game.active_player](game, rng))
+    # The next round is already dealt when the limit is reached, so the chips are counted before its blind
+    end = counter.stacks[0] if counter.stacks is not None else start
+
+    if not game.game_over:
+        outcome = 0
+    else:
+        outcome = 1 if players[1].money.value <= 0 else -1
+    return counter.rounds, end - start, outcome
+
+
+def _play_matches(strategy_a, strategy_b, seeds, max_rounds):
+    """
+    Plays a batch of matches. This is the function executed in the worker processes.
+
+    :return: List of play_match results
+    """
+    return [play_match(strategy_a, strategy_b, seed, max_rounds) for seed in seeds]
+
+
+def _play_matches_star(args):
+    return _play_matches(*args)
+
+
+def _init_worker(cache_path, table_path, spec):
+    if cache_path:
+        PokerHand.cache = EvaluationCache()
+        PokerHand.cache.load(cache_path)
+    if table_path:
+        import handtable
+        set_evaluator(handtable.HandTable(table_path))
+    if spec:
+        import sharedtables
+        sharedtables.attach_worker(spec)
+
+
+class Summary:
+    """
+    Running aggregate of match results from the first player's point of view
+    """
+    def __init__(self):
+        self.matches = self.wins = self.draws = self.rounds = 0
+        self.rate_sum = self.rate_squares = 0.0
+
+    def add(self, rounds, chips, outcome):
+        """
+        Adds the result of one match
+
+        :param rounds: Rounds played
+
+        :param chips: Chips won
+
+        :param outcome: 1/0/-1 for a win/draw/loss
+        """
+        self.matches += 1
+        self.wins += outcome == 1
+        self.draws += outcome == 0
+        self.rounds += rounds
+        rate = 100 * chips / max(rounds, 1)
+        self.rate_sum += rate
+        self.rate_squares += rate * rate
+
+    def win_rate(self):
+        """
+        :return: Fraction of matches won and its 95% confidence half-width
+        """
+        p = self.wins / self.matches
+        return p, 1.96 * math.sqrt(p * (1 - p) / self.matches)
+
+    def chips_per_100(self):
+        """
+        :return: Mean chips won per 100 rounds over the matches and its 95% confidence half-width
+        """
+        mean = self.rate_sum / self.matches
+        variance = max(self.rate_squares / self.matches - mean * mean, 0.0) * self.matches / max(self.matches - 1, 1)
+        return mean, 1.96 * math.sqrt(variance / self.matches)
+
+    def __repr__(self):
+        """
+        Overloads the __repr__ to print a one line report
+
+        """
+        win, win_error = self.win_rate()
+        chips, chips_error = self.chips_per_100()
+        return (f"{self.matches} matches, {self.rounds} rounds: win rate {win:.3f} +- {win_error:.3f}, "
+                f"draws {self.draws}, chips/100 rounds {chips:.1f} +- {chips_error:.1f}")
+
+
+def run(strategy_a, strategy_b, matches, seed=0, max_rounds=1000, processes=None, batch=8, report=None,
+        cache_path=None, table_path=None, tables=None):
+    """
+    Plays many matches on a pool of worker processes. Every match gets its own seed derived from the base seed and
+    its number, so the same matches are played whatever the number of processes or the order batches finish in.
+
+    :param strategy_a: Strategy name of the first player
+
+    :param strategy_b: Strategy name of the second player
+
+    :param matches: Number of matches
+
+    :param seed: Base seed
+
+    :param max_rounds: Round limit per match
+
+    :param processes: Number of worker processes, None for one per core
+
+    :param batch: Matches per task sent to a worker
+
+    :param report: Optional callback called with the Summary after every finished batch
+
+    :param cache_path: Optional file written by EvaluationCache.save: every worker evaluates through an
+                       EvaluationCache that starts with the hand ranks of the file
+
+    :param table_path: Optional file written by handtable.build_table, mapped by every worker to evaluate hands with
+
+    :param tables: Optional sharedtables.SharedTables the workers attach and evaluate with
+
+    :return: Summary
+    """
+    seeds = [seed * 2 ** 32 + match for match in range(matches)]
+    batches = [(strategy_a, strategy_b, seeds[i:i + batch], max_rounds) for i in range(0, matches, batch)]
+    summary = Summary()
+    spec = tables.spec() if tables is not None else None
+    with Pool(processes, _init_worker, (cache_path, table_path, spec)) as pool:
+        for results in pool.imap_unordered(_play_matches_star, batches):
+            for result in results:
+                summary.add(*result)
+            if report is not None:
+                report(summary)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play heads-up matches between two strategies.')
+    parser.add_argument('strategy_a', help='built-in strategy (' + ', '.join(STRATEGIES) + ') or module:function')
+    parser.add_argument('strategy_b', help='strategy of the opponent')
+    parser.add_argument('--matches', type=int, default=1000)
+    parser.add_argument('--max-rounds', type=int, default=1000, help='rounds after which a match is a draw')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None, help='worker processes, default one per core')
+    parser.add_argument('--batch', type=int, default=8, help='matches per worker task')
+    parser.add_argument('--eval-cache', help='evaluate with a rank cache in every worker, preloaded from this file')
+    parser.add_argument('--hand-table', help='evaluate hands with this state machine table, see handtable.py')
+    args = parser.parse_args()
+
+    summary = run(args.strategy_a, args.strategy_b, args.matches, args.seed, args.max_rounds, args.processes,
+                  args.batch, report=lambda s: print(s, file=sys.stderr), cache_path=args.eval_cache,
+                  table_path=args.hand_table)
+    print(summary)
+
+
+if __name__ == '__main__':
+    main()
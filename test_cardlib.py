@@ -0,0 +1,168 @@
+from collections import Counter
+from itertools import combinations
+from random import Random
+import pytest
+from cardlib import *
+
+
+def _reference_key(cards):
+    """
+    Orders five cards the slow and obvious way, independently of the evaluator
+
+    :return: Tuple of (hand type value, ranks deciding ties)
+    """
+    values = sorted((card.get_value() for card in cards), reverse=True)
+    groups = sorted(Counter(values).items(), key=lambda item: (item[1], item[0]), reverse=True)
+    counts = [count for _, count in groups]
+    by_count = [value for value, _ in groups]
+    flush = len({card.suit for card in cards}) == 1
+    straight = None
+    if len(groups) == 5:
+        if values[0] - values[4] == 4:
+            straight = values[0]
+        elif values == [14, 5, 4, 3, 2]:
+            straight = 5    # The ace plays low in the wheel
+    if straight and flush:
+        return 9, (straight,)
+    if counts == [4, 1]:
+        return 8, tuple(by_count)
+    if counts == [3, 2]:
+        return 7, tuple(by_count)
+    if flush:
+        return 6, tuple(values)
+    if straight:
+        return 5, (straight,)
+    if counts == [3, 1, 1]:
+        return 4, tuple(by_count)
+    if counts == [2, 2, 1]:
+        return 3, tuple(by_count)
+    if counts == [2, 1, 1, 1]:
+        return 2, tuple(by_count)
+    return 1, tuple(values)
+
+
+def _reference_best(cards):
+    return max(_reference_key(five) for five in combinations(cards, 5))
+
+
+def _sign(number):
+    return (number > 0) - (number < 0)
+
+
+def test_hand_order_matches_reference():
+    rng = Random(1)
+    hands = [rng.sample(CARDS, rng.choice((5, 6, 7))) for _ in range(3000)]
+    poker_hands = [PokerHand(cards) for cards in hands]
+    keys = [_reference_best(cards) for cards in hands]
+    for hand, key in zip(poker_hands, keys):
+        assert hand.type.value == key[0]
+    for i in range(1, len(hands)):
+        expected = (keys[i] > keys[i - 1]) - (keys[i] < keys[i - 1])
+        assert _sign(poker_hands[i].rank - poker_hands[i - 1].rank) == expected, (hands[i], hands[i - 1])
+
+
+def test_hand_order_of_close_hands():
+    # Hands that differ by one kicker, or by where the ace plays in a straight
+    def hand(*cards):
+        return PokerHand([make_card(value, suit) for value, suit in cards])
+    h, s, c, d = Suit.Hearts, Suit.Spades, Suit.Clubs, Suit.Diamonds
+    ordered = [
+        hand((14, h), (13, s), (12, c), (11, d), (9, h)),
+        hand((2, h), (2, s), (14, c), (13, d), (11, h)),
+        hand((2, h), (2, s), (14, c), (13, d), (12, h)),
+        hand((3, h), (3, s), (2, c), (2, d), (14, h)),
+        hand((14, h), (2, s), (3, c), (4, d), (5, h)),
+        hand((2, s), (3, c), (4, d), (5, h), (6, h)),
+        hand((10, h), (11, s), (12, c), (13, d), (14, h)),
+        hand((2, h), (4, h), (6, h), (8, h), (10, h)),
+        hand((2, h), (2, s), (2, c), (14, d), (14, h)),
+        hand((3, h), (3, s), (3, c), (2, d), (2, h)),
+        hand((2, h), (2, s), (2, c), (2, d), (3, h)),
+        hand((14, c), (2, c), (3, c), (4, c), (5, c)),
+        hand((10, c), (11, c), (12, c), (13, c), (14, c)),
+    ]
+    for lower, higher in zip(ordered, ordered[1:]):
+        assert lower < higher, (lower, higher)
+    assert hand((14, h), (2, s), (3, c), (4, d), (5, h)).type == HandType.STRAIGHT
+    assert hand((14, c), (2, c), (3, c), (4, c), (5, c)).type == HandType.STRAIGHT_FLUSH
+
+
+def test_equal_hands_in_different_suits():
+    hearts = PokerHand([make_card(value, Suit.Hearts) for value in (2, 5, 8, 11, 13)])
+    spades = PokerHand([make_card(value, Suit.Spades) for value in (2, 5, 8, 11, 13)])
+    assert hearts == spades
+    assert not hearts < spades and not spades < hearts
+
+
+def test_best_poker_hand_uses_table_cards():
+    hand = Hand()
+    hand.add_card(make_card(14, Suit.Hearts))
+    hand.add_card(make_card(14, Suit.Spades))
+    table = [make_card(value, Suit.Clubs) for value in (2, 7, 9, 11, 13)]
+    assert hand.best_poker_hand(table).type == HandType.FLUSH
+    assert hand.best_poker_hand(table[:3]).type == HandType.PAIR
+
+
+def _test_hands(count, size, seed=0):
+    """
+    Random hands, a third of them drawn from few suits and a third from few ranks so that flushes, straights, full
+    houses and quads come up often
+
+    :return: List of lists of card indices
+    """
+    rng = Random(seed)
+    hands = []
+    for number in range(count):
+        if number % 3 == 1:
+            deck = [index for index in range(52) if index // 13 in (0, 3)]
+        elif number % 3 == 2:
+            low = rng.randrange(9)
+            deck = [index for index in range(52) if low <= index % 13 < low + 5 or index % 13 == 12]
+        else:
+            deck = list(range(52))
+        hands.append(rng.sample(deck, size))
+    return hands
+
+
+@pytest.mark.parametrize('size', [5, 6, 7])
+def test_evaluate_batch_matches_evaluate_mask(size):
+    numpy = pytest.importorskip('numpy')
+    hands = _test_hands(3000, size)
+    expected = [evaluate_mask(sum(1 << index for index in hand)) for hand in hands]
+    assert evaluate_batch(numpy.array(hands)).tolist() == expected
+    if size == 7:
+        assert {rank >> 20 for rank in expected} == set(range(1, 10))   # Every hand type was compared
+
+
+def test_hand_evaluator_matches_evaluate_mask_street_by_street():
+    for hand in _test_hands(2000, 7, seed=1):
+        evaluator, mask = HandEvaluator(), 0
+        for count, index in enumerate(hand, 1):
+            evaluator.add_index(index)
+            mask |= 1 << index
+            if count >= 5:
+                assert evaluator.rank() == evaluate_mask(mask), hand[:count]
+        assert evaluator.hand_type() == HandType(evaluate_mask(mask) >> 20)
+
+
+def test_hand_evaluator_copy_is_independent():
+    hole = [CARDS[12], CARDS[25]]
+    evaluator = HandEvaluator(hole + [CARDS[0], CARDS[1], CARDS[2]])
+    turn = evaluator.copy()
+    turn.add(CARDS[38])     # A third ace
+    assert turn.rank() == evaluate(hole + [CARDS[0], CARDS[1], CARDS[2], CARDS[38]])
+    assert evaluator.rank() == evaluate(hole + [CARDS[0], CARDS[1], CARDS[2]])
+
+
+def test_evaluation_cache_is_opt_in_and_bounded(tmp_path):
+    assert PokerHand.cache is None
+    masks = [sum(1 << index for index in hand) for hand in _test_hands(50, 7, seed=5)]
+    cache = EvaluationCache(capacity=40)
+    assert [cache.rank(mask) for mask in masks] == [evaluate_mask(mask) for mask in masks]
+    assert cache.rank(masks[-1]) == evaluate_mask(masks[-1])
+    assert cache.stats()['hits'] == 1 and cache.stats()['size'] == 40 and cache.stats()['evictions'] == 10
+
+    cache.save(tmp_path / 'ranks.cache')
+    loaded = EvaluationCache()
+    assert loaded.load(tmp_path / 'ranks.cache') == 40
+    assert loaded.ranks == cache.ranks
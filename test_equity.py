@@ -0,0 +1,97 @@
+from itertools import combinations
+import pytest
+from cardlib import *
+from equity import EquityCalculator
+
+
+def _cards(*indices):
+    return [CARDS[index] for index in indices]
+
+
+ACES = _cards(12, 25)       # Ace of diamonds and of clubs
+KINGS = _cards(37, 50)      # King of spades and of hearts
+
+
+@pytest.fixture(scope='module')
+def calculator():
+    with EquityCalculator(processes=0, shards=8) as calculator:
+        yield calculator
+
+
+def test_rollouts_estimate_known_matchup(calculator):
+    result = calculator.equity([ACES, KINGS], iterations=40000, seed=1)
+    assert result.rollouts == 40000
+    assert result.win(0) + result.tie(0) / 2 == pytest.approx(0.82, abs=0.01)
+
+
+def test_rollout_counts_add_up(calculator):
+    hands = [ACES, KINGS, _cards(0, 1)]
+    result = calculator.equity(hands, iterations=3000, seed=2)
+    for player in range(len(hands)):
+        assert result.wins[player] + result.ties[player] + result.losses[player] == result.rollouts
+    assert sum(result.wins) <= result.rollouts
+
+
+def test_rollouts_are_reproducible(calculator):
+    first = calculator.equity([ACES, KINGS], _cards(0, 14, 28), iterations=2000, seed=3)
+    second = calculator.equity([ACES, KINGS], _cards(0, 14, 28), iterations=2000, seed=3)
+    assert (first.wins, first.ties, first.losses) == (second.wins, second.ties, second.losses)
+
+
+def test_rollouts_with_full_board_are_decided(calculator):
+    board = _cards(0, 14, 28, 42, 5)   # Two, three, four and five of different suits and a seven: a wheel for aces
+    result = calculator.equity([ACES, KINGS], board, iterations=500, seed=4)
+    assert result.wins == [500, 0] and result.ties == [0, 0]
+
+
+@pytest.mark.parametrize('max_time', [0, 0.005])
+def test_rollouts_out_of_time_still_count(calculator, max_time):
+    result = calculator.equity([ACES, KINGS], iterations=100000, max_time=max_time, seed=6)
+    assert 8 <= result.rollouts < 100000    # At least one rollout per shard
+    assert 0 < result.win(0) < 1
+    assert repr(result)
+    assert calculator.equity([ACES, KINGS], iterations=0).win(0) == 0.0
+
+def test_rollouts_do_not_depend_on_the_processes(calculator):
+    local = calculator.equity([ACES, KINGS], iterations=2000, seed=5)
+    with EquityCalculator(processes=2, shards=8) as pool:
+        pooled = pool.equity([ACES, KINGS], iterations=2000, seed=5)
+    assert (local.wins, local.ties, local.losses) == (pooled.wins, pooled.ties, pooled.losses)
+
+
+def _brute_force(hand_a, hand_b, board):
+    """
+    Counts the boards the slow way: every completion, one by one, without the suit symmetries of exact
+
+    :return: (wins of a, ties, wins of b)
+    """
+    known = cards_to_mask(hand_a) | cards_to_mask(hand_b) | cards_to_mask(board)
+    free = [index for index in range(52) if not known >> index & 1]
+    counts = [0, 0, 0]
+    for rest in combinations(free, 5 - len(board)):
+        mask = cards_to_mask(board) | sum(1 << index for index in rest)
+        a, b = evaluate_mask(mask | cards_to_mask(hand_a)), evaluate_mask(mask | cards_to_mask(hand_b))
+        counts[0 if a > b else 2 if b > a else 1] += 1
+    return counts
+
+
+@pytest.mark.parametrize('hand_a, hand_b, board', [
+    (ACES, KINGS, _cards(0, 14, 28)),
+    (_cards(12, 11), _cards(38, 37), _cards(10, 9, 23)),     # Suited ace king against another, on a flush draw
+    (_cards(0, 13), _cards(1, 14), _cards(26, 40, 5)),       # Small pairs that both flop a set
+    (ACES, KINGS, _cards(0, 14, 28, 42)),
+    (ACES, KINGS, _cards(0, 14, 28, 42, 5)),
+])
+def test_exact_matches_brute_force(calculator, hand_a, hand_b, board):
+    result = calculator.exact(hand_a, hand_b, board)
+    wins_a, ties, wins_b = _brute_force(hand_a, hand_b, board)
+    assert (result.wins, result.ties, result.losses) == ([wins_a, wins_b], [ties, ties], [wins_b, wins_a])
+    assert result.rollouts == wins_a + ties + wins_b
+
+
+def test_rollouts_converge_to_exact(calculator):
+    board = _cards(10, 9, 23)
+    exact = calculator.exact(_cards(12, 11), _cards(38, 37), board)
+    sampled = calculator.equity([_cards(12, 11), _cards(38, 37)], board, iterations=20000, seed=6)
+    assert sampled.win(0) == pytest.approx(exact.win(0), abs=0.015)
+    assert sampled.tie(0) == pytest.approx(exact.tie(0), abs=0.01)
@@ -0,0 +1,54 @@
+import os
+from random import Random
+import pytest
+from cardlib import *
+import handtable
+from test_cardlib import _test_hands
+
+
+@pytest.fixture(scope='module')
+def table():
+    if not os.path.exists(handtable.DEFAULT_PATH):
+        pytest.skip("no hand table, build it with handtable.py")
+    table = handtable.HandTable()
+    yield table
+    table.close()
+
+
+@pytest.mark.parametrize('size', range(8))
+def test_hand_table_matches_evaluate_mask(table, size):
+    hands = _test_hands(3000, size) if size >= 5 else [Random(size).sample(range(52), size) for _ in range(300)]
+    for hand in hands:
+        mask = sum(1 << index for index in hand)
+        expected = evaluate_mask(mask)
+        assert table.evaluate(hand) == expected, hand
+        assert table.evaluate_mask(mask) == expected, hand
+
+
+@pytest.mark.parametrize('size', [5, 6, 7])
+def test_hand_table_batch_matches_evaluate_mask(table, size):
+    numpy = pytest.importorskip('numpy')
+    hands = _test_hands(3000, size, seed=2)
+    expected = [evaluate_mask(sum(1 << index for index in hand)) for hand in hands]
+    assert table.evaluate_batch(numpy.array(hands)).tolist() == expected
+
+
+def test_hand_table_as_evaluator(table):
+    hands = _test_hands(300, 7, seed=3)
+    expected = [evaluate_mask(sum(1 << index for index in hand)) for hand in hands]
+    previous = set_evaluator(table)
+    try:
+        assert [PokerHand([CARDS[index] for index in hand]).rank for hand in hands] == expected
+    finally:
+        set_evaluator(previous)
+
+
+def test_states_rank_like_evaluate_mask():
+    # The states build_table is made of, checked without building it: dropping the suits that can no longer make a
+    # flush must not change any rank
+    for hand in _test_hands(600, 7, seed=4):
+        state, mask = ((0,) * 13, (0, 0, 0, 0)), 0
+        for cards, index in enumerate(hand):
+            state = handtable._next_state(*state, index, cards)
+            mask |= 1 << index
+            assert handtable._rank(*state) == evaluate_mask(mask), hand[:cards + 1]
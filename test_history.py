@@ -0,0 +1,100 @@
+from random import Random
+import pytest
+from history import HandRecord, HandRecorder, HistoryWriter, read_hands, read_records
+from pokerengine import Player, TexasHoldEm
+from simulate import STRATEGIES, play_action
+
+
+def test_record_round_trip():
+    record = HandRecord(2 ** 64 - 1, 2, [1000, 0, 513], [[12, 25], [], [0, 51]], [1, 2, 3, 4, 5],
+                        [(2, 'bet', 100), (0, 'call', 50), (2, 'check', 0), (0, 'fold', 0)], [938, 0, 575])
+    data = record.encode()
+    decoded = HandRecord.decode(data[4:])
+    assert vars(decoded) == vars(record)
+    assert decoded.encode() == data
+    assert all(isinstance(stack, int) for stack in decoded.stacks + decoded.final_stacks)
+
+
+def _record_games(writer, games, players=(2, 3, 5)):
+    for seed in range(games):
+        rng = Random(seed)
+        game = TexasHoldEm([Player(f'Player {seat + 1}') for seat in range(players[seed % len(players)])],
+                           listeners=[HandRecorder(writer)], seed=seed)
+        for _ in range(600):
+            if game.game_over:
+                break
+            play_action(game, *STRATEGIES['random'](game, rng))
+
+
+class ListWriter:
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+    def flush(self):
+        pass
+
+
+def test_recorded_games_round_trip_through_a_file(tmp_path):
+    path = tmp_path / 'games.thh'
+    recorded = ListWriter()
+    _record_games(recorded, 6)
+    with HistoryWriter(path) as writer:
+        for record in recorded.records:
+            writer.write(record)
+    hands = list(read_hands(path))
+    assert [vars(hand) for hand in hands] == [vars(record) for record in recorded.records]
+    assert any([] in hand.hole_cards for hand in hands)     # Players without money sat rounds out
+    for hand in hands:
+        assert sum(hand.stacks) == sum(hand.final_stacks)
+
+
+def test_appending_keeps_earlier_records(tmp_path):
+    path = tmp_path / 'games.thh'
+    record = HandRecord(1, 0, [1000, 1000], [[0, 1], [2, 3]], [], [(1, 'fold', 0)], [1050, 950])
+    for _ in range(2):
+        with HistoryWriter(path) as writer:
+            writer.write(record)
+    assert len(list(read_records(path))) == 2
+
+
+def test_other_files_are_refused(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'THH1' + bytes(16))
+    with pytest.raises(ValueError):
+        list(read_records(path))
+
+
+def _play_to_game_over(game, seed):
+    rng = Random(seed)
+    while not game.game_over:
+        play_action(game, *STRATEGIES['aggressive'](game, rng))
+
+
+def test_game_over_writes_the_last_rounds(tmp_path):
+    path = tmp_path / 'games.thh'
+    writer = HistoryWriter(path)
+    recorded = ListWriter()
+    game = TexasHoldEm([Player('A'), Player('B'), Player('C')],
+                       listeners=[HandRecorder(recorded), HandRecorder(writer)], seed=1)
+    _play_to_game_over(game, 1)
+    # Read back before the writer is closed, as after a program that ends with the game
+    hands = list(read_hands(path))
+    assert [vars(hand) for hand in hands] == [vars(record) for record in recorded.records]
+    assert sorted(hands[-1].final_stacks)[:2] == [0, 0]
+    writer.close()
+    writer.close()
+
+
+def test_qt_game_over_leaves_the_event_loop(tmp_path):
+    pytest.importorskip('PyQt5')
+    import pokermodel
+    path = tmp_path / 'games.thh'
+    with HistoryWriter(path) as writer:
+        game = pokermodel.TexasHoldEm([pokermodel.Player('A'), pokermodel.Player('B')], [HandRecorder(writer)],
+                                      seed=2)
+        _play_to_game_over(game, 2)     # Used to raise SystemExit from quit()
+        hands = list(read_hands(path))
+    assert hands and 0 in hands[-1].final_stacks
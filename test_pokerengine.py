@@ -0,0 +1,199 @@
+from fractions import Fraction
+from random import Random
+import pytest
+from pokerengine import GameListener, Money, Player, TexasHoldEm, batch
+from simulate import STRATEGIES, RoundCounter, play_action
+
+
+def _reference_payouts(contributions, ranks):
+    """
+    Pays a pot chip level by chip level: every level is split between the best hands of the players that put in at
+    least that much, which is what the side pots amount to. Levels that only players who folded reached are dead
+    money for the winners of the level below.
+
+    :param contributions: Chips each player put in the pot
+
+    :param ranks: Hand rank of each player, None for the ones that folded
+
+    :return: Exact share of the pot of every player, as Fractions
+    """
+    payouts = [Fraction(0)] * len(contributions)
+    winners = None
+    for level in range(1, max(contributions) + 1):
+        layer = [seat for seat, chips in enumerate(contributions) if chips >= level]
+        eligible = [seat for seat in layer if ranks[seat] is not None]
+        if eligible:
+            best = max(ranks[seat] for seat in eligible)
+            winners = [seat for seat in eligible if ranks[seat] == best]
+        for seat in winners:
+            payouts[seat] += Fraction(len(layer), len(winners))
+    return payouts
+
+
+class PotChecker(GameListener):
+    """
+    Checks every round of a game against the reference payouts and that no chip is made or lost
+    """
+    def __init__(self):
+        self.rounds = self.side_pots = 0
+        self.start = self.total = None
+
+    def on_new_round(self, game):
+        self.start = [player.money.value + player.betted.value for player in game.players]
+        if self.total is None:
+            self.total = sum(self.start)
+        assert sum(self.start) == self.total
+
+    def on_action(self, game, player, action, amount):
+        assert game.pot.value == sum(player.betted.value for player in game.players)
+
+    def on_round_end(self, game):
+        contributions = [player.betted.value for player in game.players]
+        ranks = [None if player.folded else player.hand_rank() for player in game.players]
+        expected = _reference_payouts(contributions, ranks)
+        for player, start, chips, payout in zip(game.players, self.start, contributions, expected):
+            assert abs(player.money.value - (start - chips + payout)) < 1, "more than the odd chip of a split"
+        assert sum(player.money.value for player in game.players) == self.total
+        self.rounds += 1
+        self.side_pots += len({chips for chips, rank in zip(contributions, ranks) if rank is not None}) > 1
+
+
+def _game(stacks, seed, listeners=()):
+    players = [Player(f'Player {seat + 1}') for seat in range(len(stacks))]
+    for player, stack in zip(players, stacks):
+        player.money.value = stack
+    return TexasHoldEm(players, listeners=listeners, seed=seed)
+
+
+def test_side_pots_by_all_in_level():
+    game = _game([1000, 1000, 1000], seed=0)
+    for player, bet in zip(game.players, [100, 300, 300]):
+        player.betted.value = bet
+    # The short stack has the best hand and only wins what every player put in up to its all in
+    assert game.side_pots([0, 2, 1], {0: 3, 1: 1, 2: 2}) == [(300, [0]), (400, [2])]
+    # Levels won by the same player are paid as one pot
+    assert game.side_pots([2, 0, 1], {0: 2, 1: 1, 2: 3}) == [(700, [2])]
+
+
+def test_side_pots_with_folded_chips_and_ties():
+    game = _game([1000, 1000, 1000, 1000], seed=0)
+    for player, bet in zip(game.players, [200, 200, 150, 400]):
+        player.betted.value = bet
+    # Player 3 folded after putting in 150, the two others tie for the main pot and player 4 takes back the rest
+    pots = game.side_pots([0, 1, 3], {0: 5, 1: 5, 3: 4})
+    assert sum(amount for amount, _ in pots) == 950
+    assert pots[0][0] == 750 and sorted(pots[0][1]) == [0, 1]
+    assert pots[1:] == [(200, [3])]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_all_in_showdown_pays_side_pots(seed):
+    checker = PotChecker()
+    game = _game([100, 300, 600, 1000], seed, [checker])
+    while checker.rounds == 0:
+        minimum, money = game.allowed_bets()
+        if not game.bet(money) and not game.call():
+            game.check()
+    assert checker.side_pots == 1
+
+
+@pytest.mark.parametrize('players', [2, 3, 5, 8])
+def test_random_games_conserve_chips(players):
+    for seed in range(4):
+        rng = Random(seed)
+        checker = PotChecker()
+        game = _game([rng.choice((200, 500, 1000)) for _ in range(players)], seed, [checker])
+        for _ in range(1500):
+            if game.game_over:
+                break
+            play_action(game, *STRATEGIES['random'](game, rng))
+        assert checker.rounds > 0
+        if game.game_over:
+            assert sum(player.money.value > 0 for player in game.players) == 1
+
+
+def test_nested_batches_notify_once_at_the_end():
+    changed, unchanged = Money(100), Money(100)
+    calls = {id(changed): 0, id(unchanged): 0}
+    for model in (changed, unchanged):
+        model.subscribe(lambda model=model: calls.__setitem__(id(model), calls[id(model)] + 1))
+    with batch([changed, unchanged]):
+        changed += 10
+        with batch([changed]):
+            changed -= 5
+            changed += 5
+        assert calls[id(changed)] == 0    # Still held back by the outer batch
+        changed.clear()
+    assert calls == {id(changed): 1, id(unchanged): 0}
+    changed += 1
+    assert calls[id(changed)] == 2
+
+
+def _model_state(model):
+    return getattr(model, 'value', None), list(getattr(model, 'cards', ())), getattr(model, 'flipped_cards', None)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_actions_notify_each_changed_model_once(seed):
+    rng = Random(seed)
+    counter = RoundCounter()
+    game = _game([1000] * 4, seed, [counter])
+    models = game.models()
+    calls = [0] * len(models)
+    for number, model in enumerate(models):
+        model.subscribe(lambda number=number: calls.__setitem__(number, calls[number] + 1))
+    checked = 0
+    for _ in range(300):
+        if game.game_over:
+            break
+        before, rounds = [_model_state(model) for model in models], counter.rounds
+        calls[:] = [0] * len(models)
+        play_action(game, *STRATEGIES['strength'](game, rng))
+        if counter.rounds == rounds:    # Messages at the end of a round notify what changed until then
+            assert calls == [int(_model_state(model) != state) for model, state in zip(models, before)]
+            checked += 1
+    assert checked > 20
+
+
+class ModelView(GameListener):
+    """
+    Shows what a front end driven by the change notifications would display, and checks that it is up to date
+    whenever a message or the end of a round interrupts the game
+    """
+    def __init__(self, game):
+        self.game = game
+        self.shown = {}
+        self.messages = 0
+        for model in game.models():
+            model.subscribe(lambda model=model: self.show(model))
+            self.show(model)
+
+    def show(self, model):
+        self.shown[id(model)] = self.state(model)
+
+    @staticmethod
+    def state(model):
+        return getattr(model, 'value', None), len(getattr(model, 'cards', ()))
+
+    def check(self):
+        for model in self.game.models():
+            assert self.shown[id(model)] == self.state(model)
+
+    def on_message(self, game, text):
+        self.messages += 1
+        self.check()
+
+    def on_round_end(self, game):
+        self.check()
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_models_are_notified_before_messages(seed):
+    game = _game([100, 300, 600], seed)
+    view = ModelView(game)
+    game.listeners.append(view)
+    while not game.game_over:
+        minimum, money = game.allowed_bets()
+        if not game.bet(money) and not game.call():
+            game.check()
+    assert view.messages > 0
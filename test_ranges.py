@@ -0,0 +1,80 @@
+from itertools import combinations
+import pytest
+from cardlib import *
+
+pytest.importorskip('numpy')
+from ranges import Range, parse_cards, range_equity
+
+
+@pytest.mark.parametrize('text, combos', [
+    ('AA', 6), ('AKs', 4), ('AKo', 12), ('AK', 16), ('TT+', 30), ('TT-77', 24), ('77-TT', 24),
+    ('A2s+', 48), ('KTo-K7o', 48), ('K7o-KTo', 48), ('QJ+', 16), ('AhKh', 1), ('TT+, AKs, KQo', 46),
+    ('AA, AhAs', 6),
+])
+def test_parse_counts(text, combos):
+    assert len(Range.parse(text)) == combos
+
+
+def test_parse_cards_and_weights():
+    assert Range.parse('AhKh').combos == {cards_to_mask(parse_cards('AhKh')): 1.0}
+    hand_range = Range.parse('AKs, AhKh:0.25')
+    assert sorted(hand_range.combos.values()) == [0.25, 1.0, 1.0, 1.0]
+    assert parse_cards('Td2c') == [make_card(10, Suit.Diamonds), make_card(2, Suit.Clubs)]
+
+
+@pytest.mark.parametrize('text', ['AKx', 'A', 'ZZ', 'AKs-QJs', 'TT-A9', 'AhAh', 'AKs+s', 'AAs'])
+def test_parse_refuses_invalid_tokens(text):
+    with pytest.raises(ValueError):
+        Range.parse(text)
+
+
+def test_without_removes_dead_cards_and_zero_weights():
+    hand_range = Range.parse('AA, KK:0')
+    assert len(hand_range.without(cards_to_mask(parse_cards('Ah')))) == 3
+
+
+def _brute_force(hero, villain, board):
+    """
+    Weighted win and tie fractions of hero, every matchup played on every runout one by one
+    """
+    board_mask = cards_to_mask(board)
+    win = tie = total = 0.0
+    for hero_mask, hero_weight in hero.without(board_mask).combos.items():
+        for villain_mask, villain_weight in villain.without(board_mask).combos.items():
+            if hero_mask & villain_mask:
+                continue
+            dead = board_mask | hero_mask | villain_mask
+            free = [index for index in range(52) if not dead >> index & 1]
+            wins = ties = count = 0
+            for rest in combinations(free, 5 - len(board)):
+                cards = board_mask | sum(1 << index for index in rest)
+                a, b = evaluate_mask(cards | hero_mask), evaluate_mask(cards | villain_mask)
+                wins, ties, count = wins + (a > b), ties + (a == b), count + 1
+            weight = hero_weight * villain_weight
+            win, tie, total = win + weight * wins / count, tie + weight * ties / count, total + weight
+    return win / total, tie / total
+
+
+@pytest.mark.parametrize('hero, villain, board', [
+    ('AA', 'KK', 'Kh7d2c'),
+    ('AA, KQs:0.5', 'KK, QJo', 'Qh7h2c'),
+    ('TT+, AKs', 'AK, 99', 'Ah9d2c5s'),
+    ('AhKh, 22', 'QQ, JTs:0.3', 'ThJh2c5s8d'),
+])
+def test_range_equity_matches_brute_force(hero, villain, board):
+    result = range_equity(hero, villain, parse_cards(board))
+    win, tie = _brute_force(Range.parse(hero), Range.parse(villain), parse_cards(board))
+    assert result.win(0) == pytest.approx(win, abs=1e-9)
+    assert result.tie(0) == pytest.approx(tie, abs=1e-9)
+    assert result.win(0) + result.tie(0) + result.lose(0) == pytest.approx(1)
+    assert result.win(1) == pytest.approx(result.lose(0))
+
+
+def test_range_equity_samples_preflop():
+    result = range_equity('AA', 'KK', iterations=4000, seed=1)
+    assert result.win(0) + result.tie(0) / 2 == pytest.approx(0.82, abs=0.02)
+
+
+def test_range_equity_refuses_ranges_blocked_by_the_board():
+    with pytest.raises(ValueError):
+        range_equity('AhKh', 'QQ', parse_cards('Ah7d2c'))
@@ -0,0 +1,49 @@
+from copy import deepcopy
+import pytest
+from history import HistoryWriter
+from replay import ReplayError, replay, replay_file
+from test_history import ListWriter, _record_games
+
+
+@pytest.fixture(scope='module')
+def records():
+    writer = ListWriter()
+    _record_games(writer, 6)
+    return writer.records
+
+
+def test_recorded_rounds_replay(records):
+    showdowns = 0
+    for record in records:
+        game = replay(record)
+        showdowns += bool(game.winners())
+    assert showdowns > 0
+
+
+def test_changed_results_are_detected(records):
+    record = deepcopy(next(record for record in records if record.final_stacks[0] != record.final_stacks[1]))
+    record.final_stacks[0], record.final_stacks[1] = record.final_stacks[1], record.final_stacks[0]
+    with pytest.raises(ReplayError):
+        replay(record)
+
+
+def test_changed_actions_are_detected(records):
+    record = deepcopy(next(record for record in records if len(record.actions) > 1))
+    player, _, _ = record.actions[0]
+    record.actions[0] = ((player + 1) % len(record.stacks), 'check', 0)
+    with pytest.raises(ReplayError):
+        replay(record)
+
+
+def test_replay_file_reports_corrupt_records(tmp_path, records):
+    path = tmp_path / 'games.thh'
+    with HistoryWriter(path) as writer:
+        for record in records[:50]:
+            writer.write(record)
+    data = bytearray(path.read_bytes())
+    data[-20:] = b'\xff' * 20   # The stacks at the end of the last record become garbage, its length stays valid
+    data += (8).to_bytes(4, 'little') + bytes(8)    # A record cut short
+    path.write_bytes(bytes(data))
+    total, failures = replay_file(path, processes=1, chunk=16)
+    assert total == 51
+    assert [index for index, _ in failures] == [49, 50]
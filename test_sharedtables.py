@@ -0,0 +1,57 @@
+import os
+from multiprocessing import shared_memory
+import pytest
+from cardlib import *
+from equity import EquityCalculator
+import handtable
+from test_cardlib import _test_hands
+from test_equity import ACES, KINGS, _cards
+
+np = pytest.importorskip('numpy')
+from sharedtables import publish_tables, worker_tables
+
+
+def _worker_ranks(hands):
+    """
+    Runs in a worker of the pool
+
+    :return: Tuple of (spec of the tables the worker attached, evaluate_batch ranks, evaluate_mask ranks)
+    """
+    masks = [sum(1 << index for index in hand) for hand in hands]
+    return (worker_tables().spec(), evaluate_batch(np.array(hands)).tolist(),
+            [evaluate_mask(mask) for mask in masks])
+
+
+def _check_worker(hand_table=None):
+    hands = _test_hands(600, 7, seed=7)
+    expected = [evaluate_mask(sum(1 << index for index in hand)) for hand in hands]
+    tables = publish_tables(hand_table)
+    block_names = [block.name for block in tables.blocks.values()]
+    try:
+        with EquityCalculator(processes=1, shards=4, tables=tables) as pooled:
+            spec, batch_ranks, mask_ranks = pooled.pool.submit(_worker_ranks, hands).result()
+            pooled_result = pooled.equity([ACES, KINGS], _cards(0, 14, 28), iterations=2000, seed=8)
+        assert spec == tables.spec()    # The worker mapped the parent's blocks instead of building its own
+        assert batch_ranks == expected and mask_ranks == expected
+        with EquityCalculator(processes=0, shards=4) as local:
+            local_result = local.equity([ACES, KINGS], _cards(0, 14, 28), iterations=2000, seed=8)
+        assert (pooled_result.wins, pooled_result.ties) == (local_result.wins, local_result.ties)
+    finally:
+        tables.close()
+    for name in block_names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+def test_workers_evaluate_with_the_published_tables():
+    _check_worker()
+
+
+def test_workers_evaluate_with_a_published_hand_table():
+    if not os.path.exists(handtable.DEFAULT_PATH):
+        pytest.skip("no hand table, build it with handtable.py")
+    table = handtable.HandTable()
+    try:
+        _check_worker(table)
+    finally:
+        table.close()